@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+"""Throughput and peak memory benchmark for the raw loader and analyzer hot paths.
+
+Runs over synthetic FITS cubes and DNG-shaped raw mosaics at several sensor sizes
+and ROI fractions. Results can be saved as a JSON baseline and later runs compared
+against it, exiting with a non zero code on regressions.
+
+    python benchmarks/hot_paths.py [--sizes hq large] [--rois 1 0.5] [--save FILE] [--baseline FILE]
+"""
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+from astropy.io import fits
+
+# -----------
+# Own package
+# -----------
+
+from lica.raw.loader import NormRoi, CHANNELS, SyntheticImageLoader
+from lica.raw.loader.exif import ExifImageLoader
+from lica.raw.loader.fits import FitsImageLoader
+from lica.raw.analyzer.image import ImageStatistics, ImagePairStatistics
+
+# ----------------
+# Module constants
+# ----------------
+
+# Bayer plane sizes (height, width)
+SENSORS = {
+    "v2": (1232, 1640),  # RPi camera v2, 8 Mpix
+    "hq": (1520, 2028),  # RPi HQ camera, 12 Mpix
+    "large": (3000, 4000),  # 48 Mpix
+}
+
+BIAS = 256
+WHITE_LEVEL = 4095
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+class _StateCache:
+    """Metadata cache look-alike, so that ExifImageLoader needs no file nor LibRaw"""
+
+    def __init__(self, raw_shape):
+        self._state = {
+            "raw_shape": list(raw_shape),
+            "cfa": "RGGB",
+            "color_desc": "RGBG",
+            "biases": [BIAS] * len(CHANNELS),
+            "white_levels": [WHITE_LEVEL] * len(CHANNELS),
+            "exif": {key: "0" if key in ExifImageLoader.FRACTION_KEYS else None
+                     for key in ExifImageLoader.EXIF_KEYS},
+        }
+
+    def get(self, path):
+        return self._state
+
+    def put(self, path, state):
+        pass
+
+
+def mosaic(shape, seed=0):
+    """Raw Bayer mosaic, twice the plane size, with 12 bit dark frame like values"""
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    pixels = rng.normal(BIAS, 8, size=(2 * height, 2 * width))
+    return np.clip(pixels, 0, WHITE_LEVEL).astype(np.uint16)
+
+
+def exif_loader(raw, n_roi, channels):
+    """DNG-shaped loader with the raw mosaic injected, as with keep_raw=True"""
+    loader = ExifImageLoader("synthetic.dng", n_roi, channels, cache=_StateCache(raw.shape))
+    loader._raw_pixels = raw
+    return loader
+
+
+def fits_cube(directory, shape, seed):
+    """Writes a 4 plane uint16 cube with the usual BZERO unsigned convention"""
+    planes = np.stack(np.split(mosaic(shape, seed), 2, axis=0)).reshape((4,) + shape)
+    hdu = fits.PrimaryHDU(planes)
+    hdu.header["EXPTIME"] = 1.0
+    hdu.header["BAYER"] = "RGGB"
+    path = os.path.join(directory, f"cube-{shape[1]}x{shape[0]}-{seed}.fits")
+    hdu.writeto(path, overwrite=True)
+    return path
+
+
+def measure(setup, func, repeat):
+    """Best wall time over repeat runs and peak traced memory of an extra run.
+    setup() is excluded from both measures."""
+    best = np.inf
+    for _ in range(repeat):
+        arg = setup()
+        t0 = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - t0)
+    arg = setup()
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def cases(raw, cube_a, cube_b, n_roi):
+    """(name, setup, func, loaded pixels) tuples for a given sensor and ROI"""
+    rgb = ("R", "G", "B")
+
+    def planes():
+        # G averaging path, not available with ExifImageLoader
+        loader = SyntheticImageLoader((raw.shape[0] // 2, raw.shape[1] // 2), n_roi, rgb)
+        with loader._planes() as planes:
+            return loader, planes
+
+    fits_loader = FitsImageLoader(cube_a, n_roi, CHANNELS)
+    n_pix = fits_loader.load().size
+    return [
+        ("exif.load", lambda: exif_loader(raw, n_roi, CHANNELS), lambda ld: ld.load(), n_pix),
+        ("exif.statistics", lambda: exif_loader(raw, n_roi, CHANNELS),
+         lambda ld: ld.statistics(), n_pix),
+        ("select_by_channels[RGB]", planes, lambda arg: arg[0]._select_by_channels(arg[1]),
+         n_pix * 3 // 4),
+        ("fits.load", lambda: FitsImageLoader(cube_a, n_roi, CHANNELS), lambda ld: ld.load(), n_pix),
+        ("fits.load[section]", lambda: FitsImageLoader(cube_a, n_roi, CHANNELS, section=True),
+         lambda ld: ld.load(), n_pix),
+        ("fits.statistics", lambda: FitsImageLoader(cube_a, n_roi, CHANNELS),
+         lambda ld: ld.statistics(), n_pix),
+        ("ImageStatistics.run",
+         lambda: ImageStatistics.from_path(cube_a, n_roi, CHANNELS, bias=float(BIAS)),
+         lambda st: (st.run(), st.mean(), st.variance()), n_pix),
+        ("ImagePairStatistics.run",
+         lambda: ImagePairStatistics.from_path(cube_a, cube_b, n_roi, CHANNELS, bias=float(BIAS)),
+         lambda st: (st.run(), st.pair_mean(), st.adj_pair_variance()), 2 * n_pix),
+    ]
+
+
+def run(sizes, fractions, repeat):
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            shape = SENSORS[size]
+            raw = mosaic(shape)
+            cube_a = fits_cube(directory, shape, 1)
+            cube_b = fits_cube(directory, shape, 2)
+            for fraction in fractions:
+                n_roi = NormRoi(n_width=fraction, n_height=fraction)
+                for name, setup, func, n_pix in cases(raw, cube_a, cube_b, n_roi):
+                    elapsed, peak = measure(setup, func, repeat)
+                    key = f"{name} {size} roi={fraction:g}"
+                    results[key] = {
+                        "mpix_s": n_pix / elapsed / 1e6,
+                        "seconds": elapsed,
+                        "peak_mib": peak / 2**20,
+                    }
+                    print(f"{key:<44} {results[key]['mpix_s']:9.1f} MPix/s "
+                          f"{results[key]['peak_mib']:9.1f} MiB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns the list of regressions against the baseline results"""
+    regressions = list()
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if current["mpix_s"] < base["mpix_s"] * (1 - tolerance):
+            regressions.append(f"{key}: {current['mpix_s']:.1f} MPix/s, baseline {base['mpix_s']:.1f}")
+        if current["peak_mib"] > base["peak_mib"] * (1 + tolerance) + 1:
+            regressions.append(f"{key}: {current['peak_mib']:.1f} MiB, baseline {base['peak_mib']:.1f}")
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=SENSORS, default=["v2", "hq"],
+                        help="Sensor sizes to run")
+    parser.add_argument("--rois", nargs="+", type=float, default=[1.0, 0.5, 0.1],
+                        help="ROI width and height fractions")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case, best one kept")
+    parser.add_argument("--save", default=None, help="Save results as a JSON baseline")
+    parser.add_argument("--baseline", default=None, help="Compare against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative slowdown or memory growth considered a regression")
+    args = parser.parse_args()
+    results = run(args.sizes, args.rois, args.repeat)
+    if args.save:
+        document = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "results": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"FAIL: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+"""Import time regression benchmark for lica.raw.loader.
+
+Importing the package (e.g. just to use Roi or NormRoi) must not pull
+any loader backend, nor asyncio or importlib.metadata. Exits with a non zero code on regressions.
+
+    python benchmarks/import_time.py [--repeat N] [--max-ms MS]
+"""
+
+# --------------------
+# System wide imports
+# -------------------
+
+import sys
+import subprocess
+import statistics
+from argparse import ArgumentParser
+
+# ----------------
+# Module constants
+# ----------------
+
+MODULE = "lica.raw.loader"
+# Heavy modules that must only be imported on first use
+BACKENDS = ("rawpy", "exifread", "astropy", "asyncio", "importlib.metadata")
+
+PROBE = f"""
+import sys, time
+t0 = time.perf_counter()
+import {MODULE}
+t1 = time.perf_counter()
+print((t1 - t0) * 1000)
+print(' '.join(m for m in {BACKENDS!r} if m in sys.modules))
+"""
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def probe():
+    """Fresh interpreter per sample, as the import cache would hide the cost otherwise"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], check=True, capture_output=True, text=True
+    ).stdout.splitlines()
+    loaded = output[1].split() if len(output) > 1 else []
+    return float(output[0]), loaded
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail above this median time")
+    args = parser.parse_args()
+    samples = list()
+    for _ in range(args.repeat):
+        elapsed, loaded = probe()
+        if loaded:
+            print(f"FAIL: import {MODULE} loaded heavy modules: {', '.join(loaded)}")
+            return 1
+        samples.append(elapsed)
+    median = statistics.median(samples)
+    print(f"import {MODULE}: median {median:.1f} ms, min {min(samples):.1f} ms over {args.repeat} runs")
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median import time above {args.max_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import logging
+import tempfile
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+from astropy.io import fits
+
+# ------------------------
+# Own modules and packages
+# ------------------------
+
+from ..loader import ImageLoaderFactory, CHANNELS
+from ..loader.streaming import row_blocks
+
+# ----------------
+# Module constants
+# ----------------
+
+METHODS = ("mean", "median", "sigma-clip")
+
+# Default memory budget for the per block stack and its temporaries
+COMBINE_BYTES = 64 * 1024 * 1024
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def sigma_clip(stack, sigma=3.0, iters=5):
+    """Mean along the first axis, iteratively rejecting values further than
+    sigma standard deviations from the median. stack is modified in place"""
+    for _ in range(iters):
+        center = np.nanmedian(stack, axis=0)
+        deviation = np.abs(stack - center)
+        rejected = deviation > sigma * np.nanstd(stack, axis=0)
+        if not np.any(rejected):
+            break
+        stack[rejected] = np.nan
+    return np.nanmean(stack, axis=0)
+
+
+def _combine_block(block, method, sigma, iters):
+    if method == "mean":
+        return np.mean(block, axis=0, dtype=np.float64)
+    if method == "median":
+        return np.median(block, axis=0)
+    return sigma_clip(block.astype(np.float32), sigma, iters)
+
+
+def _stage(paths, factory, staging):
+    """Decodes every frame once into a (n, 4, h, w) disk backed stack.
+    Returns the stack and the exposure times"""
+    exptimes = list()
+    stack = None
+    for i, path in enumerate(paths):
+        loader = factory.image_from(path, None, CHANNELS)
+        if stack is None:
+            first = loader.load()
+            stack = np.lib.format.open_memmap(
+                staging, mode="w+", dtype=first.dtype, shape=(len(paths),) + first.shape
+            )
+            stack[0] = first
+            del first
+        else:
+            loader.load(out=stack[i])
+        exptimes.append(loader.exptime())
+        log.debug("Staged %s", path)
+    stack.flush()
+    return stack, exptimes
+
+
+def combine(paths, output, method="median", sigma=3.0, iters=5, imagetyp="bias",
+            max_bytes=COMBINE_BYTES, tmpdir=None, factory=None):
+    """Combines full frames into a master bias or dark, written as a (4, h, w) float32
+    FITS cube in CHANNELS order, readable by FitsImageLoader.
+
+    Frames are decoded one at a time into a temporary memory mapped stack and then
+    combined by row blocks, so that peak memory is one frame plus max_bytes,
+    whatever the number of frames. Returns the master frame"""
+    if method not in METHODS:
+        raise ValueError(f"Combination method {method} not in {METHODS}")
+    if len(paths) == 0:
+        raise ValueError("No frames to combine")
+    factory = ImageLoaderFactory() if factory is None else factory
+    with tempfile.TemporaryDirectory(dir=tmpdir) as directory:
+        stack, exptimes = _stage(paths, factory, os.path.join(directory, "stack.npy"))
+        n, N, height, width = stack.shape
+        master = np.empty((N, height, width), dtype=np.float32)
+        # float64 copies of the block for the worst case method
+        row_bytes = 2 * n * width * 8
+        for k in range(N):
+            for rows in row_blocks(height, row_bytes, max_bytes):
+                master[k, rows] = _combine_block(stack[:, k, rows], method, sigma, iters)
+        del stack
+    header = fits.Header()
+    header["EXPTIME"] = (float(np.mean(exptimes)), "Mean exposure time of combined frames")
+    header["IMAGETYP"] = imagetyp
+    header["NCOMBINE"] = (len(paths), "Number of combined frames")
+    header["COMBMETH"] = method
+    if method == "sigma-clip":
+        header["CLIPSIG"] = sigma
+    fits.PrimaryHDU(master, header=header).writeto(output, overwrite=True)
+    log.info("Master %s from %d frames written to %s", imagetyp, len(paths), output)
+    return master
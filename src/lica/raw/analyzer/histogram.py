@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import logging
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+
+# ------------------------
+# Own modules and packages
+# ------------------------
+
+from .image import ImageStatistics
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------
+# Classes
+# -------
+
+
+class HistogramImageStatistics(ImageStatistics):
+    '''Exact statistics from one histogram per channel of the native integer pixels.
+
+    A single bincount pass per channel, then every statistic in O(65536), so
+    percentiles come without sorting. Pixels are never converted to floating point:
+    bias and dark are applied analytically to the results, as a per channel offset.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self._hist = None
+        self._levels = None
+        self._saturation = None
+
+    def _configure(self, bias, dark, dtype=None):
+        # Histograms need the native unsigned integer pixels
+        super()._configure(bias, dark, np.uint16)
+
+    def run(self):
+        super().run()
+        pixels = self._pixels
+        if pixels.dtype.kind != 'u' or pixels.dtype.itemsize > 2:
+            raise ValueError(
+                f'Histogram statistics need up to 16 bit unsigned pixels, not {pixels.dtype}')
+        length = np.iinfo(pixels.dtype).max + 1
+        self._hist = np.stack([np.bincount(plane.ravel(), minlength=length) for plane in pixels])
+        self._levels = np.arange(length, dtype=np.float64)
+        try:
+            self._saturation = np.asarray(self._image.saturation_levels())
+        except NotImplementedError:
+            log.info('No saturation levels available, using %d', length - 1)
+            self._saturation = np.full(len(pixels), length - 1)
+
+    def histogram(self):
+        '''(N, 65536) raw counts per channel, before any bias subtraction'''
+        return self._hist
+
+    def count(self):
+        return self._hist.sum(axis=1)
+
+    def compute_all(self, median=True):
+        n = self.count()
+        raw_mean = (self._hist @ self._levels) / n
+        deviation = self._levels - raw_mean.reshape(-1, 1)
+        offset = self.offset()
+        self._mean = raw_mean - offset
+        self._variance = np.sum(self._hist * deviation * deviation, axis=1) / (n - 1)
+        nonzero = self._hist > 0
+        self._min = np.argmax(nonzero, axis=1) - offset
+        self._max = self._hist.shape[1] - 1 - np.argmax(nonzero[:, ::-1], axis=1) - offset
+        if median:
+            self._median = self.percentile(50)
+
+    def median(self):
+        if self._median is None:
+            self._median = self.percentile(50)
+        return self._median
+
+    def percentile(self, q):
+        '''Per channel q-th percentiles, with the same linear interpolation as np.percentile.
+        Returns an (N,) array for a scalar q or an (N, len(q)) array otherwise'''
+        q = np.asarray(q, dtype=np.float64)
+        cdf = np.cumsum(self._hist, axis=1)
+        n = cdf[:, -1]
+        result = list()
+        for k in range(len(cdf)):
+            position = np.atleast_1d(q) / 100 * (n[k] - 1)
+            lower = np.floor(position)
+            # Value at rank r is the first level whose cumulative count exceeds r
+            below = np.searchsorted(cdf[k], lower, side='right')
+            above = np.searchsorted(cdf[k], np.minimum(lower + 1, n[k] - 1), side='right')
+            result.append(below + (above - below) * (position - lower))
+        result = np.array(result) - self.offset().reshape(-1, 1)
+        return result[:, 0] if q.ndim == 0 else result
+
+    def saturated(self):
+        '''Per channel count of raw pixels at or above the saturation level'''
+        return np.array([hist[level:].sum() for hist, level in zip(self._hist, self._saturation)])
+
+    def zeros(self):
+        '''Per channel count of raw pixels at zero'''
+        return self._hist[:, 0].copy()
+
+    def summary(self):
+        summary = super().summary()
+        summary['saturated'] = self.saturated()
+        summary['zeros'] = self.zeros()
+        return summary
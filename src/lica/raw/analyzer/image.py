@@ -23,6 +23,7 @@ import numpy as np
 # ------------------------
 
 from ..loader import ImageLoaderFactory
+from ..loader.streaming import RunningStatistics, row_blocks
 
 # -----------------------
 # Module global variables
@@ -36,11 +37,20 @@ log = logging.getLogger(__name__)
 
 
 class ImageStatistics:
+    '''Per channel statistics of a bias and dark calibrated image.
+
+    dtype is the working pixel type. Floating point types calibrate in place into
+    a single buffer. Integer types keep the loaded pixels as they are and only
+    record a per channel offset, subtracted from the final statistics.
+    '''
+
     def __init__(self):
         '''Should not be used to instantiate directly'''
         self._pixels = None
         self._bias = None
         self._dark = None
+        self._dtype = np.float32
+        self._offset = None  # Per channel (N, 1, 1) level still present in pixels
         self._mean = None
         self._min = None
         self._max = None
@@ -49,22 +59,23 @@ class ImageStatistics:
         self._factory = ImageLoaderFactory()
 
     @classmethod
-    def from_path(cls, path, n_roi, channels, bias=None, dark=None):
+    def from_path(cls, path, n_roi, channels, bias=None, dark=None, dtype=np.float32):
         obj = cls()
         obj._image = obj._factory.image_from(path, n_roi, channels)
-        obj._configure(bias, dark)
+        obj._configure(bias, dark, dtype)
         return obj
 
     @classmethod
-    def attach(cls, loader, bias=None, dark=None):
+    def attach(cls, loader, bias=None, dark=None, dtype=np.float32):
         obj = cls()
         obj._image = loader
-        obj._configure(bias, dark)
+        obj._configure(bias, dark, dtype)
         return obj
 
-    def _configure(self, bias, dark):
+    def _configure(self, bias, dark, dtype=np.float32):
         if self._bias is not None:
             return
+        self._dtype = np.dtype(dtype)
         channels = self._image.channels()
         n_roi = self._image.n_roi()
         N = len(channels)
@@ -86,55 +97,109 @@ class ImageStatistics:
                      self._bias.reshape(-1), self._dark)
         else:
             log.info("Bias level per channel: %s.", self._bias.reshape(-1))
+        if np.issubdtype(self._dtype, np.integer):
+            if self._bias.shape[1:] != (1, 1):
+                raise ValueError("Integer calibration needs a per channel bias, not a bias frame")
+            dark = 0 if self._dark is None else self._dark
+            self._offset = self._bias.astype(np.float64) + dark
+        else:
+            self._offset = np.zeros((N, 1, 1))
 
     def loader(self):
         '''access to underying image loader for extra methods such as image.exptime()'''
         return self._image
 
-    def run(self):
+    def _calibrate(self, image):
+        '''Stack of image color planes, cropped by ROI, loaded straight into a buffer
+        of the working dtype where bias and dark are subtracted in place'''
+        if np.issubdtype(self._dtype, np.integer):
+            # Fast path, the offset is subtracted from the statistics instead
+            return image.load()
+        roi = image.roi()
+        shape = (len(image.channels()), roi.y1 - roi.y0, roi.x1 - roi.x0)
+        pixels = image.load(out=np.empty(shape, dtype=self._dtype))
+        pixels -= self._bias
         if self._dark is not None:
-            self._pixels = self._image.load().astype(dtype=np.float32, copy=False) - \
-                self._bias - self._dark  # Stack of image color planes, cropped by ROI
-        else:
-            self._pixels = self._image.load().astype(
-                dtype=np.float32, copy=False) - self._bias
+            pixels -= self._dark
+        return pixels
+
+    def run(self):
+        self._pixels = self._calibrate(self._image)
+        self._mean = self._variance = self._min = self._max = self._median = None
+
+    def compute_all(self, median=True):
+        '''Mean, variance, min and max of every channel in a single blockwise pass over
+        the pixels, plus a selection step for the median. Cached for the accessors'''
+        pixels = self._pixels
+        N, height, width = pixels.shape
+        running = RunningStatistics(N, count_saturated=False)
+        for k in range(N):
+            for rows in row_blocks(height, width * 8):
+                running.update(k, pixels[k, rows])
+        offset = self.offset()
+        self._mean = running.mean - offset
+        self._variance = running.variance(ddof=1)
+        self._min = running.min - offset
+        self._max = running.max - offset
+        if median and self._median is None:
+            self._median = self._median_by_selection()
+
+    def _median_by_selection(self):
+        # One channel at a time, so the partition temporary is a single plane
+        return np.array([np.median(plane) for plane in self._pixels]) - self.offset()
+
+    def summary(self):
+        '''All statistics per channel as a dictionary, computed at most once'''
+        if self._mean is None:
+            self.compute_all()
+        elif self._median is None:
+            self.median()
+        return {
+            "mean": self._mean,
+            "variance": self._variance,
+            "std": np.sqrt(self._variance),
+            "median": self._median,
+            "min": self._min,
+            "max": self._max,
+        }
 
     def name(self):
         return self._image.name()
 
     def pixels(self):
+        '''Calibrated pixels, or raw pixels with an integer dtype (see offset())'''
         return self._pixels
 
+    def offset(self):
+        '''Per channel level still to be subtracted from pixels(), zero unless integer dtype'''
+        return self._offset.reshape(-1)
+
     def mean(self):
         if self._mean is None:
-            self._mean = np.mean(self._pixels,  axis=(1, 2))
+            self.compute_all(median=False)
         return self._mean
 
     def variance(self):
         if self._variance is None:
-            self._variance = np.var(self._pixels, axis=(
-                1, 2), dtype=np.float64, ddof=1)
+            self.compute_all(median=False)
         return self._variance
 
     def std(self):
-        if self._variance is None:
-            self._variance = np.var(self._pixels, axis=(
-                1, 2), dtype=np.float64, ddof=1)
-        return np.sqrt(self._variance)
+        return np.sqrt(self.variance())
 
     def median(self):
         if self._median is None:
-            self._median = np.median(self._pixels,  axis=(1, 2))
+            self._median = self._median_by_selection()
         return self._median
 
     def min(self):
         if self._min is None:
-            self._min = np.min(self._pixels,  axis=(1, 2))
+            self.compute_all(median=False)
         return self._min
 
     def max(self):
         if self._max is None:
-            self._max = np.max(self._pixels,  axis=(1, 2))
+            self.compute_all(median=False)
         return self._max
 
 
@@ -148,21 +213,17 @@ class ImagePairStatistics(ImageStatistics):
         self._pair_variance = None
 
     @classmethod
-    def from_path(cls, path_a, path_b, n_roi, channels, bias=None, dark=None):
+    def from_path(cls, path_a, path_b, n_roi, channels, bias=None, dark=None, dtype=np.float32):
         obj = cls()
         obj._image = obj._factory.image_from(path_a, n_roi, channels)
-        obj._configure(bias, dark)
+        obj._configure(bias, dark, dtype)
         obj._image_b = obj._factory.image_from(path_b, n_roi, channels)
         return obj
 
     def run(self):
         super().run()
-        if self._dark is not None:
-            self._pixels_b = self._image_b.load().astype(
-                np.float32, copy=False) - self._bias - self._dark
-        else:
-            self._pixels_b = self._image_b.load().astype(
-                np.float32, copy=False) - self._bias
+        self._pixels_b = self._calibrate(self._image_b)
+        self._pair_mean = self._pair_variance = None
 
     def names(self):
         '''Like name() but returns'''
@@ -170,14 +231,20 @@ class ImagePairStatistics(ImageStatistics):
 
     def pair_mean(self):
         '''Mean of pair of images'''
-        if not self._pair_mean:
-            self._pair_mean = np.mean(
-                (self._pixels + self._pixels_b),  axis=(1, 2)) / 2
-        return self._mean
+        if self._pair_mean is None:
+            # Same as the mean of the sum but without a temporary that may overflow
+            self._pair_mean = (np.mean(self._pixels, axis=(1, 2), dtype=np.float64) +
+                               np.mean(self._pixels_b, axis=(1, 2), dtype=np.float64)) / 2 \
+                - self.offset()
+        return self._pair_mean
 
     def adj_pair_variance(self):
         '''variance of pair adjusted by a final 1/2 factor'''
-        if not self._pair_variance:
+        if self._pair_variance is None:
+            # Offsets cancel out, but unsigned differences must not wrap around
+            # Integer dtypes still give float pixels when averaging the G channel
+            dtype = np.int32 if np.issubdtype(self._pixels.dtype, np.integer) else None
             self._pair_variance = np.var(
-                (self._pixels - self._pixels_b), axis=(1, 2), dtype=np.float64, ddof=1) / 2
+                np.subtract(self._pixels, self._pixels_b, dtype=dtype),
+                axis=(1, 2), dtype=np.float64, ddof=1) / 2
         return self._pair_variance
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import logging
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+
+# ------------------------
+# Own modules and packages
+# ------------------------
+
+from ..loader import Roi, NormRoi, RoiSet
+from .image import ImageStatistics
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------
+# Classes
+# -------
+
+
+class IntegralImageStatistics(ImageStatistics):
+    '''Constant time mean and variance for any ROI, using per channel summed-area tables.
+
+    ROIs refer to the loaded pixels, i.e. to the loader ROI, not the whole image.
+    Tables take 2 x N x (h+1) x (w+1) float64 values. Pixels are shifted by their rounded
+    per channel mean before summing, to avoid cancellation in the variance.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self._shift = None
+        self._sum = None
+        self._sum2 = None
+
+    def run(self):
+        super().run()
+        pixels = self._pixels
+        N, height, width = pixels.shape
+        self._shift = np.round(pixels.mean(axis=(1, 2), dtype=np.float64)).reshape(N, 1, 1)
+        self._sum = np.zeros((N, height + 1, width + 1), dtype=np.float64)
+        self._sum2 = np.zeros((N, height + 1, width + 1), dtype=np.float64)
+        shifted = self._sum2[:, 1:, 1:]  # used as scratch buffer before the squares
+        np.subtract(pixels, self._shift, out=shifted)
+        np.cumsum(shifted, axis=1, out=self._sum[:, 1:, 1:])
+        np.cumsum(self._sum[:, 1:, 1:], axis=2, out=self._sum[:, 1:, 1:])
+        np.square(shifted, out=shifted)
+        np.cumsum(shifted, axis=1, out=shifted)
+        np.cumsum(shifted, axis=2, out=shifted)
+
+    def _box(self, table, x0, x1, y0, y1):
+        return table[:, y1, x1] - table[:, y0, x1] - table[:, y1, x0] + table[:, y0, x0]
+
+    def box_statistics(self, x0, x1, y0, y1):
+        '''Mean and variance for K boxes given as coordinate arrays (NumPy [y0:y1,x0:x1] style).
+        Returns two (N, K) arrays'''
+        x0, x1, y0, y1 = (np.asarray(c, dtype=np.intp) for c in (x0, x1, y0, y1))
+        n = ((x1 - x0) * (y1 - y0)).astype(np.float64)
+        s = self._box(self._sum, x0, x1, y0, y1)
+        s2 = self._box(self._sum2, x0, x1, y0, y1)
+        mean = s / n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (s2 - s * mean) / (n - 1)
+        return mean + (self._shift - self._offset).reshape(-1, 1), variance
+
+    def rois_statistics(self, rois):
+        '''Mean and variance for a RoiSet or a sequence of Roi or NormRoi objects.
+        Returns two (N, K) arrays'''
+        if isinstance(rois, RoiSet):
+            return self.box_statistics(rois.x0, rois.x1, rois.y0, rois.y1)
+        rois = [self._roi(roi) for roi in rois]
+        return self.box_statistics(
+            [roi.x0 for roi in rois], [roi.x1 for roi in rois],
+            [roi.y0 for roi in rois], [roi.y1 for roi in rois])
+
+    def _roi(self, roi):
+        if isinstance(roi, NormRoi):
+            height, width = self._pixels.shape[1:]
+            roi = Roi.from_normalized_roi(width, height, roi, already_debayered=True)
+        return roi
+
+    def roi_mean(self, roi):
+        mean, _ = self.rois_statistics([roi])
+        return mean[:, 0]
+
+    def roi_variance(self, roi):
+        _, variance = self.rois_statistics([roi])
+        return variance[:, 0]
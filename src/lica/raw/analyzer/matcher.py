@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import logging
+import functools
+import collections
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# ------------------------
+# Own modules and packages
+# ------------------------
+
+from ..loader import ImageLoaderFactory
+from ..loader.abstract import UnsupportedCFAError
+from ..loader.batch import executor_for
+from .ptc import PairJob
+
+# ----------------
+# Module constants
+# ----------------
+
+# Metadata that frames of a pair must share
+GROUP_KEYS = ("exptime", "iso", "camera")
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+FrameInfo = collections.namedtuple("FrameInfo", ("path", "exptime", "iso", "camera", "datetime"))
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def frame_info(factory, path):
+    """Grouping metadata of a single frame, None if it is not a readable image.
+    Any other error, such as a metadata cache failure, is raised"""
+    try:
+        metadata = factory.image_from(path, header_only=True).metadata()
+        return FrameInfo(
+            path=path,
+            # Rounded to the microsecond so that equal exposures compare equal
+            exptime=round(float(metadata["exposure"]), 6),
+            iso=str(metadata.get("iso")),
+            camera=str(metadata.get("camera")),
+            datetime=str(metadata.get("datetime") or ""),
+        )
+    # KeyError for images lacking the exposure time keyword
+    except (OSError, KeyError, ValueError, UnsupportedCFAError) as e:
+        log.warning("Skipping %s: %s", path, e)
+        return None
+
+
+def frame_infos(paths, max_workers=None, cache=None, processes=False):
+    """Metadata of all frames in one parallel sweep, only reading image headers.
+    A MetadataCache makes later sweeps over the same files almost free"""
+    factory = ImageLoaderFactory(cache=cache)
+    with executor_for(max_workers, processes) as executor:
+        infos = executor.map(functools.partial(frame_info, factory), paths)
+        return [info for info in infos if info is not None]
+
+
+def group_frames(infos, keys=GROUP_KEYS):
+    """Frames grouped by the given metadata keys, each group in acquisition order"""
+    groups = collections.defaultdict(list)
+    for info in infos:
+        groups[tuple(getattr(info, key) for key in keys)].append(info)
+    for group in groups.values():
+        group.sort(key=lambda info: (info.datetime, info.path))
+    return dict(sorted(groups.items(), key=lambda item: str(item[0])))
+
+
+def pair_jobs(groups):
+    """Consecutive, non overlapping pairs of each group as PTC pair jobs"""
+    jobs = list()
+    for key, group in groups.items():
+        if len(group) % 2:
+            log.info("Group %s has an odd number of frames, %s left out", key, group[-1].path)
+        for a, b in zip(group[0::2], group[1::2]):
+            jobs.append(PairJob(a.path, b.path, a.exptime))
+    return jobs
+
+
+def match_pairs(paths, keys=GROUP_KEYS, max_workers=None, cache=None, processes=False):
+    """Ready to run PTC pair jobs from a list of paths, as given by lica.misc.file_paths()"""
+    return pair_jobs(group_frames(frame_infos(paths, max_workers, cache, processes), keys))
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import csv
+import sqlite3
+import logging
+import functools
+import collections
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+
+# ------------------------
+# Own modules and packages
+# ------------------------
+
+from ..loader.batch import bounded_map, default_workers, executor_for
+from .image import ImagePairStatistics
+
+# ----------------
+# Module constants
+# ----------------
+
+HEADER = ("path_a", "path_b", "exptime", "channel", "mean", "variance")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ptc_t
+(
+    path_a      TEXT    NOT NULL,
+    path_b      TEXT    NOT NULL,
+    exptime     REAL,
+    channel     TEXT    NOT NULL,
+    mean        REAL    NOT NULL,
+    variance    REAL    NOT NULL,
+    PRIMARY KEY (path_a, path_b, channel)
+)
+"""
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# A flat pair to be analyzed. exptime may be None to take it from the first image
+PairJob = collections.namedtuple("PairJob", ("path_a", "path_b", "exptime"))
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def pair_rows(job, n_roi=None, channels=None, bias=None, dark=None, dtype=np.float32):
+    """One row per channel with the pair mean and the adjusted pair variance.
+    Pixels only live while the pair is analyzed. Failed pairs are logged and give no rows"""
+    path_a, path_b, exptime = job
+    try:
+        stats = ImagePairStatistics.from_path(path_a, path_b, n_roi, channels, bias, dark, dtype)
+        stats.run()
+        mean = stats.pair_mean()
+        variance = stats.adj_pair_variance()
+        exptime = stats.loader().exptime() if exptime is None else exptime
+    except Exception as e:
+        log.error("Skipping pair %s, %s: %s", path_a, path_b, e)
+        return []
+    return [
+        {
+            "path_a": path_a,
+            "path_b": path_b,
+            "exptime": float(exptime),
+            "channel": channel,
+            "mean": float(mean[k]),
+            "variance": float(variance[k]),
+        }
+        for k, channel in enumerate(stats.loader().channels())
+    ]
+
+
+def ptc_rows(pairs, n_roi=None, channels=None, bias=None, dark=None, dtype=np.float32,
+             max_workers=None, processes=False, window=None):
+    """Yields the rows of each (path_a, path_b, exptime) pair as soon as it is done.
+    At most window pairs are in flight, twice the number of workers by default"""
+    window = 2 * default_workers(max_workers) if window is None else window
+    work = functools.partial(
+        pair_rows, n_roi=n_roi, channels=channels, bias=bias, dark=dark, dtype=dtype
+    )
+    with executor_for(max_workers, processes) as executor:
+        yield from bounded_map(executor, work, (PairJob(*pair) for pair in pairs), window,
+                               ordered=False)
+
+
+def run_ptc(pairs, sink, **kwargs):
+    """Streams the PTC rows of all pairs to a sink. Returns the number of rows written"""
+    written = 0
+    for rows in ptc_rows(pairs, **kwargs):
+        if rows:
+            sink.write(rows)
+            written += len(rows)
+    return written
+
+
+# -------
+# Classes
+# -------
+
+
+class CsvSink:
+    """PTC rows appended to a CSV file, flushed pair by pair"""
+
+    def __init__(self, path, delimiter=";"):
+        self._file = open(path, "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=HEADER, delimiter=delimiter)
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SqliteSink:
+    """PTC rows stored in a ptc_t table, committed pair by pair"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(SCHEMA)
+
+    def write(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ptc_t(path_a, path_b, exptime, channel, mean, variance) "
+                "VALUES (:path_a, :path_b, :exptime, :channel, :mean, :variance)",
+                rows,
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
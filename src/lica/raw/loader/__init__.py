@@ -10,6 +10,8 @@
 # System wide imports
 # -------------------
 
+import importlib
+
 # ---------------------
 # Thrid-party libraries
 # ---------------------
@@ -19,9 +21,13 @@
 # ----------
 
 from .factory import ImageLoaderFactory
-from .roi import Roi, NormRoi
+from .roi import Roi, NormRoi, RoiSet
 from .constants import LABELS, CHANNELS
-from .simulation import SimulatedDarkImage
+from .cache import MetadataCache
+from .prefetch import Prefetcher
+from .planecache import PlaneCache
+from .registry import LoaderRegistry, register
+from .synthetic import SyntheticImageLoader
 
 # ---------
 # Constants
@@ -29,8 +35,25 @@ from .simulation import SimulatedDarkImage
 
 FULL_FRAME_NROI = NormRoi(0, 0, 1, 1)
 
+# Heavy loader backends are only imported when first accessed (PEP 562)
+_LAZY = {
+    "SimulatedDarkImage": ".simulation",
+    "ExifImageLoader": ".exif",
+    "FitsImageLoader": ".fits",
+}
+
 # ----------
 # Exceptions
 # ----------
 
-__all__ = ["ImageLoaderFactory","Roi","NormRoi","LABELS","CHANNELS","SimulatedDarkImage"]
\ No newline at end of file
+__all__ = ["ImageLoaderFactory","Roi","NormRoi","RoiSet","LABELS","CHANNELS","SimulatedDarkImage","MetadataCache","Prefetcher","PlaneCache","LoaderRegistry","register","SyntheticImageLoader"]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
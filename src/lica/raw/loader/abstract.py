@@ -22,11 +22,27 @@ import numpy as np
 # -----------
 
 from .constants import CHANNELS, LABELS
-from .roi import NormRoi
+from .roi import Roi, NormRoi
+from .streaming import TILE_BYTES, RunningStatistics, row_blocks
+
+# ----------
+# Exceptions
+# ----------
+
+
+class UnsupportedCFAError(ValueError):
+    """Unsupported Color Filter Array type"""
+
+    def __str__(self):
+        s = self.__doc__
+        if self.args:
+            s = " {0}: {1}".format(s, str(self.args[0]))
+        s = "{0}.".format(s)
+        return s
 
 
 class AbstractImageLoader:
-    def __init__(self, path, n_roi=None, channels=None, azotea=False):
+    def __init__(self, path, n_roi=None, channels=None, azotea=False, plane_cache=None):
         self._path = path
         self._n_roi = NormRoi(0.0, 0.0, 1.0, 1.0) if n_roi is None else n_roi
         self._full_image = (
@@ -38,6 +54,7 @@ class AbstractImageLoader:
         self._name = None
         self._metadata = dict()
         self._azotea = azotea  # To enforce AZOTEA metadata is present
+        self._plane_cache = plane_cache  # Optional PlaneCache shared among loaders
 
     # -----------------------------
     # To be used in derived classes
@@ -58,17 +75,51 @@ class AbstractImageLoader:
             pixels = pixels[y0:y1, x0:x1]  # Extract ROI
         return pixels
 
-    def _select_by_channels(self, initial_list):
-        output_list = list()
-        for ch in self._channels:
+    def _load(self, out=None):
+        """Actual decoding of the Bayer planes, to be implemented by derived classes"""
+        raise NotImplementedError
+
+    def _planes(self, roi=None):
+        """Context manager yielding the four Bayer planes, indexed as CHANNELS
+        and already trimmed by the given ROI (the loader ROI by default).
+        Planes not needed by the selected channels may be None.
+        Planes are only valid within the context"""
+        raise NotImplementedError
+
+    def _plane_roi(self, roi):
+        """Roi in Bayer plane coordinates from a Roi or a NormRoi over the whole plane"""
+        if isinstance(roi, NormRoi):
+            height, width = self.shape()
+            roi = Roi.from_normalized_roi(width, height, roi, already_debayered=True)
+        return roi
+
+    def _needed_planes(self):
+        """Indices of the Bayer planes needed to build the selected channels"""
+        needed = {1, 2} if "G" in self._channels else set()
+        return needed | {CHANNELS.index(ch) for ch in self._channels if ch != "G"}
+
+    def _select_by_channels(self, initial_list, out=None):
+        """Writes the selected channels into a single (N, h, w) array, allocated if out is None.
+        initial_list is indexed as CHANNELS and may hold views or None for unneeded planes"""
+        first = np.asarray(next(item for item in initial_list if item is not None))
+        shape = (len(self._channels),) + first.shape
+        if out is None:
+            # This assumes that initial list is a pixel array list when averaging greens
+            dtype = np.result_type(first, np.float32) if "G" in self._channels else first.dtype
+            out = np.empty(shape, dtype=dtype)
+        elif out.shape != shape:
+            raise ValueError(f"output buffer shape {out.shape} does not match {shape}")
+        elif "G" in self._channels and not np.issubdtype(out.dtype, np.floating):
+            raise ValueError(
+                f"G=(Gr+Gb)/2 channel needs a floating point output buffer, not {out.dtype}"
+            )
+        for k, ch in enumerate(self._channels):
             if ch == "G":
-                # This assumes that initial list is a pixel array list
-                aver_green = (initial_list[1] + initial_list[2]).astype(np.float32) / 2
-                output_list.append(aver_green)
+                np.add(initial_list[1], initial_list[2], out=out[k], dtype=out.dtype)
+                out[k] /= 2
             else:
-                i = CHANNELS.index(ch)
-                output_list.append(initial_list[i])
-        return np.stack(output_list)
+                out[k] = initial_list[CHANNELS.index(ch)]
+        return out
 
     # ----------
     # Public API
@@ -116,10 +167,92 @@ class AbstractImageLoader:
     def black_levels(self):
         raise NotImplementedError
 
-    def load(self):
-        """Load a stack of Bayer colour planes selected by the channels sequence"""
-        raise NotImplementedError
+    def load(self, out=None):
+        """Load a stack of Bayer colour planes selected by the channels sequence.
+        If given, out is a preallocated (N, h, w) array to be filled and returned,
+        of a floating point dtype when averaging the G channel.
+        With a plane cache, the returned stack is read-only unless out is given"""
+        if self._plane_cache is None:
+            return self._load(out)
+        key = self._plane_cache.key(self._path, self.roi(), self._channels)
+        pixels = self._plane_cache.get(key)
+        if pixels is None:
+            pixels = self._plane_cache.put(key, self._load())
+        if out is not None:
+            out[...] = pixels
+            return out
+        return pixels
 
     def statistics(self):
         """In-place statistics calculation for RPi Zero"""
         raise NotImplementedError
+
+    def load_rois(self, rois):
+        """Decodes the image once and returns a list of (N, h, w) stacks, one per Roi or NormRoi.
+        ROIs refer to the whole Bayer plane, not to this loader ROI.
+        Stacks are views on a single array covering the bounding box of all ROIs"""
+        rois = [self._plane_roi(roi) for roi in rois]
+        bbox = Roi(
+            min(roi.x0 for roi in rois),
+            max(roi.x1 for roi in rois),
+            min(roi.y0 for roi in rois),
+            max(roi.y1 for roi in rois),
+        )
+        with self._planes(bbox) as planes:
+            pixels = self._select_by_channels(planes)
+        return [
+            pixels[:, roi.y0 - bbox.y0 : roi.y1 - bbox.y0, roi.x0 - bbox.x0 : roi.x1 - bbox.x0]
+            for roi in rois
+        ]
+
+    def roi_statistics(self, rois):
+        """Mean and variance for each Roi or NormRoi, from a single decode.
+        Returns two (N, len(rois)) arrays, channel first like tile_statistics()"""
+        stacks = self.load_rois(rois)
+        mean = np.array([stack.mean(axis=(1, 2), dtype=np.float64) for stack in stacks])
+        variance = np.array([stack.var(axis=(1, 2), dtype=np.float64, ddof=1) for stack in stacks])
+        return mean.T, variance.T
+
+    def tile_statistics(self, nx, ny):
+        """Mean and variance over a regular grid of ny x nx tiles covering this loader ROI.
+        Remainder rows and columns are left out. Returns two (N, ny, nx) arrays"""
+        pixels = self.load()
+        N, height, width = pixels.shape
+        th = height // ny
+        tw = width // nx
+        if th == 0 or tw == 0:
+            raise ValueError(f"{ny} x {nx} tiles do not fit in a {height} x {width} ROI")
+        tiles = pixels[:, : ny * th, : nx * tw].reshape(N, ny, th, nx, tw)
+        mean = tiles.mean(axis=(2, 4), dtype=np.float64)
+        variance = tiles.var(axis=(2, 4), dtype=np.float64, ddof=1)
+        return mean, variance
+
+    async def aload(self, out=None):
+        """Awaitable load(), run in the shared image loading executor"""
+        from . import aio  # asyncio only imported by async callers
+
+        return await aio.run(self.load, out)
+
+    async def astatistics(self):
+        """Awaitable statistics(), run in the shared image loading executor"""
+        from . import aio  # asyncio only imported by async callers
+
+        return await aio.run(self.statistics)
+
+    def tiled_statistics(self, max_bytes=TILE_BYTES):
+        """Single pass statistics over row blocks, keeping temporaries within max_bytes.
+        Returns a dictionary of per channel mean, variance, min, max and saturated pixel count"""
+        self._check_channels(err_msg="Tiled statistics on G=(Gr+Gb)/2 channel not available")
+        with self._planes() as planes:
+            # Looked up once planes are open, as loaders may read levels from the same handle
+            try:
+                saturation = self.saturation_levels()
+            except NotImplementedError:
+                saturation = None
+            stats = RunningStatistics(len(self._channels), saturation)
+            for k, ch in enumerate(self._channels):
+                plane = planes[CHANNELS.index(ch)]
+                row_bytes = plane.shape[1] * np.dtype(np.float64).itemsize
+                for rows in row_blocks(plane.shape[0], row_bytes, max_bytes):
+                    stats.update(k, plane[rows])
+        return stats.result()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# -----------
+# Own package
+# -----------
+
+# ----------------
+# Module constants
+# ----------------
+
+DEFAULT_WORKERS = 2
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+_lock = threading.Lock()
+_executor = None
+_max_workers = DEFAULT_WORKERS
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def configure(max_workers=DEFAULT_WORKERS):
+    """Sets how many images can be loaded concurrently by the awaitable API.
+    Already running loads in a previous executor are allowed to finish."""
+    global _executor, _max_workers
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+        _max_workers = max_workers
+
+
+def executor():
+    """Shared executor for all awaitable image loading, created on first use"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(_max_workers, thread_name_prefix="lica-raw")
+        return _executor
+
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+        _executor = None
+
+
+async def run(func, *args, **kwargs):
+    """Awaits a blocking call run in the shared executor, not stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(func, *args, **kwargs))
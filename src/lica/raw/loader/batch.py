@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import itertools
+import multiprocessing
+import collections
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# -----------
+# Own package
+# -----------
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def default_workers(max_workers=None):
+    return (os.cpu_count() or 1) if max_workers is None else max_workers
+
+
+def executor_for(max_workers=None, processes=False):
+    """Process pool for CPU bound Python code, thread pool when the work releases the GIL"""
+    if processes:
+        # LibRaw is built with OpenMP, which may deadlock in forked processes
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(default_workers(max_workers), mp_context=context)
+    return ThreadPoolExecutor(default_workers(max_workers))
+
+
+def bounded_map(executor, fn, iterable, window, ordered=True):
+    """Like Executor.map() but with at most window tasks in flight, so that memory
+    stays bounded for long inputs. Results come in input order or as they complete."""
+    iterable = iter(iterable)
+    pending = collections.deque() if ordered else set()
+
+    def submit(n):
+        for item in itertools.islice(iterable, n):
+            future = executor.submit(fn, item)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+
+    submit(window)
+    if ordered:
+        while pending:
+            result = pending.popleft().result()
+            submit(1)
+            yield result
+    else:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            submit(len(done))
+            for future in done:
+                yield future.result()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# -----------
+# Own package
+# -----------
+
+# ----------------
+# Module constants
+# ----------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata_t
+(
+    path    TEXT    NOT NULL,
+    size    INTEGER NOT NULL,
+    mtime   INTEGER NOT NULL,
+    state   TEXT    NOT NULL,
+    PRIMARY KEY (path)
+)
+"""
+
+# Seconds to wait for a lock held by another process sharing the database
+BUSY_TIMEOUT = 30.0
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """Persistent image metadata index stored in a SQLite file.
+
+    Entries are keyed by absolute path and invalidated when
+    either the file size or its modification time change.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Only the database path travels to worker processes
+        return {"path": self._path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _key(self, image_path):
+        stat = os.stat(image_path)
+        return os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, image_path):
+        """Returns the cached state dictionary for an image or None if missing or stale"""
+        path, size, mtime = self._key(image_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM metadata_t WHERE path = ? AND size = ? AND mtime = ?",
+                (path, size, mtime),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, image_path, state):
+        path, size, mtime = self._key(image_path)
+        state = json.dumps(state, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata_t(path, size, mtime, state) VALUES (?, ?, ?, ?)",
+                (path, size, mtime, state),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM metadata_t")
+
+    def close(self):
+        self._conn.close()
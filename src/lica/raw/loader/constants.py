@@ -14,6 +14,15 @@
 LABELS = (("Red", "R"), ("Green r", "Gr"), ("Green b", "Gb"), ("Blue", "B"))
 CHANNELS = ("R", "Gr", "Gb", "B")
 
+# (x, y) offsets of each Bayer plane within the 2x2 CFA cell
+CFA_OFFSETS = {
+    # Esto era segun mi entendimiento
+    'RGGB': {'R': {'x': 0, 'y': 0}, 'Gr': {'x': 1, 'y': 0}, 'Gb': {'x': 0, 'y': 1}, 'B': {'x': 1, 'y': 1}},
+    'BGGR': {'R': {'x': 1, 'y': 1}, 'Gr': {'x': 1, 'y': 0}, 'Gb': {'x': 0, 'y': 1}, 'B': {'x': 0, 'y': 0}},
+    'GRBG': {'R': {'x': 1, 'y': 0}, 'Gr': {'x': 0, 'y': 0}, 'Gb': {'x': 1, 'y': 1}, 'B': {'x': 0, 'y': 1}},
+    'GBRG': {'R': {'x': 0, 'y': 1}, 'Gr': {'x': 0, 'y': 0}, 'Gb': {'x': 1, 'y': 1}, 'B': {'x': 1, 'y': 0}},
+}
+
 FITS_EXTENSIONS = (".fts", ".fit", ".fits")
 
 EXIF_EXTENSIONS = ('.jpg', '.jpeg', '.dng', '.cr2')
@@ -10,9 +10,11 @@
 # System wide imports
 # -------------------
 
+import io
 import os
 import fractions
 import logging
+import contextlib
 
 # ---------------------
 # Thrid-party libraries
@@ -26,9 +28,9 @@ import numpy as np
 # Own package
 # -----------
 
-from .constants import CHANNELS
+from .constants import CHANNELS, CFA_OFFSETS
 from .roi import Roi
-from .abstract import AbstractImageLoader
+from .abstract import AbstractImageLoader, UnsupportedCFAError  # noqa: F401
 
 # ---------
 # Constants
@@ -36,22 +38,6 @@ from .abstract import AbstractImageLoader
 
 log = logging.getLogger(__name__)
 
-# ----------
-# Exceptions
-# ----------
-
-
-class UnsupportedCFAError(ValueError):
-    '''Unsupported Color Filter Array type'''
-
-    def __str__(self):
-        s = self.__doc__
-        if self.args:
-            s = ' {0}: {1}'.format(s, str(self.args[0]))
-        s = '{0}.'.format(s)
-        return s
-
-
 # ----------------
 # Auxiliar classes
 # ----------------
@@ -60,24 +46,42 @@ class ExifImageLoader(AbstractImageLoader):
 
     BAYER_LETTER = ['B', 'G', 'R', 'G']
     BAYER_PTN_LIST = ('RGGB', 'BGGR', 'GRBG', 'GBRG')
-    CFA_OFFSETS = {
-        # Esto era segun mi entendimiento
-        'RGGB': {'R': {'x': 0, 'y': 0}, 'Gr': {'x': 1, 'y': 0}, 'Gb': {'x': 0, 'y': 1}, 'B': {'x': 1, 'y': 1}},
-        'BGGR': {'R': {'x': 1, 'y': 1}, 'Gr': {'x': 1, 'y': 0}, 'Gb': {'x': 0, 'y': 1}, 'B': {'x': 0, 'y': 0}},
-        'GRBG': {'R': {'x': 1, 'y': 0}, 'Gr': {'x': 0, 'y': 0}, 'Gb': {'x': 1, 'y': 1}, 'B': {'x': 0, 'y': 1}},
-        'GBRG': {'R': {'x': 0, 'y': 1}, 'Gr': {'x': 0, 'y': 0}, 'Gb': {'x': 1, 'y': 1}, 'B': {'x': 1, 'y': 0}},
-    }
-
-    def __init__(self, path, n_roi=None, channels=None):
-        super().__init__(path, n_roi, channels)
+    CFA_OFFSETS = CFA_OFFSETS
+
+    # EXIF metadata that does not depend on ROI or channels and can be cached
+    FRACTION_KEYS = ('exposure', 'focal_length', 'f_number')
+    EXIF_KEYS = ('datetime', 'iso', 'camera', 'maker', 'note') + FRACTION_KEYS
+
+    def __init__(self, path, n_roi=None, channels=None, keep_raw=False, cache=None, plane_cache=None,
+                 header_only=False):
+        super().__init__(path, n_roi, channels, plane_cache=plane_cache)
         self._shape = None
         self._raw_shape = None
         self._color_desc = None
         self._cfa = None
         self._biases = None
         self._white_levels = None
-        self._raw()  # read raw metadata first to get image size
-        self._exif()  # read exif metadata
+        self._keep_raw = keep_raw
+        self._raw_pixels = None  # decoded raw mosaic, only kept if keep_raw is True
+        self._cache = cache
+        state = None if cache is None or keep_raw else cache.get(path)
+        if state is not None and state['raw_shape'] is None and not header_only:
+            state = None  # Header only entry, LibRaw metadata still missing
+        if state is not None:
+            self._set_state(state)
+            if self._raw_shape is None:
+                self._header_geometry(*state['size'])
+            else:
+                self._geometry()
+        elif header_only:
+            self._read_header()  # LibRaw is deferred until really needed
+            if cache is not None:
+                cache.put(path, self._get_state())
+        else:
+            self._read()  # single file read for both LibRaw and EXIF metadata
+            if cache is not None:
+                cache.put(path, self._get_state())
+            self._geometry()
 
     def _raw_metadata(self, img):
         '''To be used in teh context of an image context manager'''
@@ -86,33 +90,94 @@ class ExifImageLoader(AbstractImageLoader):
                              for row in (1, 0) for column in (1, 0)])
         self._biases = img.black_level_per_channel
         self._white_levels = img.camera_white_level_per_channel
-        self._metadata['pedestal'] = self.black_levels()
         self._metadata['bayerpat'] = self._cfa
         self._metadata['colordesc'] = self._color_desc
         self._raw_shape = (img.sizes.raw_height, img.sizes.raw_width)
 
-    def _raw(self):
-        with rawpy.imread(self._path) as img:
-            #log.info(" -----> LibRaw I/O [init] for %s", os.path.basename(self._path))
-            self._raw_metadata(img)
+    def _read(self):
+        '''Read the file once and feed both LibRaw and EXIF parser from the same buffer'''
+        with open(self._path, 'rb') as f:
+            buffer = f.read()
+        with rawpy.imread(io.BytesIO(buffer)) as img:
+            self._raw_metadata(img)  # read raw metadata first to get image size
+            if self._keep_raw:
+                # raw_image is LibRaw owned memory, no longer valid once closed
+                self._raw_pixels = img.raw_image.copy()
+        self._exif(io.BytesIO(buffer))
 
-    def _exif(self):
+    def _read_header(self):
+        '''Only the EXIF tags needed to sort and group images, no MakerNote, no LibRaw'''
         with open(self._path, 'rb') as f:
-            #log.info(" -----> EXIF I/O [init] for %s", os.path.basename(self._path))
-            exif = exifread.process_file(f, details=True)
-        if not exif:
-            raise ValueError('Could not open EXIF metadata')
-        # EXIF image size ias incorrectly reported and we have to read it from rawpy directly
-        width = self._raw_shape[1]
-        height = self._raw_shape[0]
-        self._shape = (height//2, width//2)
+            # ExifImageLength (0xA003) is the last tag needed in the EXIF IFD.
+            # details=False already skips the MakerNote, which comes before it
+            exif = exifread.process_file(f, stop_tag='ExifImageLength', details=False,
+                                         extract_thumbnail=False)
+        self._exif_metadata(exif)
+        # Provisional plane size, as EXIF image size is not reliable until LibRaw is read
+        width = exif.get('EXIF ExifImageWidth', exif.get('Image ImageWidth'))
+        height = exif.get('EXIF ExifImageLength', exif.get('Image ImageLength'))
+        self._header_geometry(width.values[0] // 2 if width else None,
+                              height.values[0] // 2 if height else None)
+
+    def _header_geometry(self, width, height):
+        '''Metadata available before LibRaw is read'''
         self._name = os.path.basename(self._path)
-        self._roi = Roi.from_normalized_roi(
-            width, height, self._n_roi, already_debayered=False)
-        # General purpose metadata
         self._metadata['name'] = self._name
-        self._metadata['roi'] = str(self._roi)
         self._metadata['channels'] = ' '.join(self._channels)
+        self._metadata['width'] = width
+        self._metadata['height'] = height
+
+    def _deferred_raw_metadata(self, img):
+        '''LibRaw metadata of header only loaders, from an already open image'''
+        self._raw_metadata(img)
+        if self._keep_raw:
+            self._raw_pixels = img.raw_image.copy()
+        if self._cache is not None:
+            # Upgrades a header only cache entry to a full one
+            self._cache.put(self._path, self._get_state())
+        self._geometry()
+
+    def _raw(self):
+        '''Deferred LibRaw metadata read for header only loaders'''
+        if self._raw_shape is not None:
+            return
+        with rawpy.imread(self._path) as img:
+            self._deferred_raw_metadata(img)
+
+    @contextlib.contextmanager
+    def _raw_image(self):
+        '''Yields the raw mosaic, either the one kept at init time or a fresh LibRaw read.
+        Deferred LibRaw metadata is read from the same handle, so the file is opened once'''
+        if self._raw_pixels is not None:
+            yield self._raw_pixels
+        else:
+            with rawpy.imread(self._path) as img:
+                if self._raw_shape is None:
+                    self._deferred_raw_metadata(img)
+                yield img.raw_image
+
+    @contextlib.contextmanager
+    def _planes(self, roi=None):
+        with self._raw_image() as raw_image:
+            raw_pixels_list = list()
+            for channel in CHANNELS:
+                x = self.CFA_OFFSETS[self._cfa][channel]['x']
+                y = self.CFA_OFFSETS[self._cfa][channel]['y']
+                # This is the real debayering thing, as a strided view
+                raw_pixels = raw_image[y::2, x::2]
+                if roi is None:
+                    raw_pixels = self._trim(raw_pixels)
+                else:
+                    raw_pixels = raw_pixels[roi.y0:roi.y1, roi.x0:roi.x1]
+                raw_pixels_list.append(raw_pixels)
+            yield raw_pixels_list
+
+    def _exif(self, f):
+        self._exif_metadata(exifread.process_file(f, details=True))
+
+    def _exif_metadata(self, exif):
+        if not exif:
+            raise ValueError('Could not open EXIF metadata')
         # Metadata coming from EXIF
         for key in ('Image DateTime', 'EXIF DateTimeOriginal'):
             datetime = exif.get(key)
@@ -121,8 +186,6 @@ class ExifImageLoader(AbstractImageLoader):
         self._metadata['datetime'] = datetime
         self._metadata['exposure'] = fractions.Fraction(
             str(exif.get('EXIF ExposureTime', 0)))
-        self._metadata['width'] = self._shape[1]
-        self._metadata['height'] = self._shape[0]
         self._metadata['iso'] = str(exif.get('EXIF ISOSpeedRatings'))
         self._metadata['camera'] = str(exif.get('Image Model')).strip()
         self._metadata['focal_length'] = fractions.Fraction(
@@ -132,6 +195,23 @@ class ExifImageLoader(AbstractImageLoader):
         self._metadata['maker'] = str(exif.get('Image Make'))
         # Useless fo far ...
         self._metadata['note'] = str(exif.get('EXIF MakerNote'))
+
+    def _geometry(self):
+        '''Metadata depending on the ROI and channels chosen for this loader'''
+        # EXIF image size ias incorrectly reported and we have to read it from rawpy directly
+        width = self._raw_shape[1]
+        height = self._raw_shape[0]
+        self._shape = (height//2, width//2)
+        self._name = os.path.basename(self._path)
+        self._roi = Roi.from_normalized_roi(
+            width, height, self._n_roi, already_debayered=False)
+        # General purpose metadata
+        self._metadata['name'] = self._name
+        self._metadata['roi'] = str(self._roi)
+        self._metadata['channels'] = ' '.join(self._channels)
+        self._metadata['width'] = self._shape[1]
+        self._metadata['height'] = self._shape[0]
+        self._metadata['pedestal'] = self.black_levels()
         self._metadata['log-gain'] = None  # Not known until load time
         # Not usually available in EXIF headers
         self._metadata['xpixsize'] = None
@@ -140,6 +220,41 @@ class ExifImageLoader(AbstractImageLoader):
         # using an heuristic based on file names
         self._metadata['imagetyp'] = None
 
+    def _get_state(self):
+        '''File intrinsic metadata, as a JSON serializable dictionary for the metadata cache'''
+        exif = {key: str(self._metadata[key]) if self._metadata[key] is not None else None
+                for key in self.EXIF_KEYS}
+        if self._raw_shape is None:
+            # Header only state, restored without LibRaw metadata
+            return {
+                'raw_shape': None,
+                'size': [self._metadata['width'], self._metadata['height']],
+                'exif': exif,
+            }
+        return {
+            'raw_shape': list(self._raw_shape),
+            'cfa': self._cfa,
+            'color_desc': self._color_desc,
+            'biases': list(self._biases),
+            'white_levels': list(self._white_levels) if self._white_levels is not None else None,
+            'exif': exif,
+        }
+
+    def _set_state(self, state):
+        '''Restores the file intrinsic metadata from the metadata cache'''
+        if state['raw_shape'] is not None:
+            self._raw_shape = tuple(state['raw_shape'])
+            self._cfa = state['cfa']
+            self._color_desc = state['color_desc']
+            self._biases = state['biases']
+            self._white_levels = state['white_levels']
+            self._metadata['bayerpat'] = self._cfa
+            self._metadata['colordesc'] = self._color_desc
+        for key, value in state['exif'].items():
+            if key in self.FRACTION_KEYS:
+                value = fractions.Fraction(value)
+            self._metadata[key] = value
+
     # ----------
     # Public API
     # ----------
@@ -147,8 +262,18 @@ class ExifImageLoader(AbstractImageLoader):
     def metadata(self):
         return self._metadata
 
+    def shape(self):
+        '''Overrides base method, as LibRaw may not have been read yet'''
+        self._raw()
+        return self._shape
+
+    def roi(self):
+        self._raw()
+        return self._roi
+
     def cfa_pattern(self):
         '''Returns the Bayer pattern as RGGB, BGGR, GRBG, GBRG strings'''
+        self._raw()
         if self._color_desc != 'RGBG':
             raise UnsupportedCFAError(self._color_desc)
         return self._cfa
@@ -156,6 +281,7 @@ class ExifImageLoader(AbstractImageLoader):
     def saturation_levels(self):
         self._check_channels(
             err_msg="saturation_levels on G=(Gr+Gb)/2 channel not available")
+        self._raw()
         if self._white_levels is None:
             raise NotImplementedError(
                 "saturation_levels for this image not available using LibRaw")
@@ -164,34 +290,25 @@ class ExifImageLoader(AbstractImageLoader):
     def black_levels(self):
         self._check_channels(
             err_msg="black_levels on G=(Gr+Gb)/2 channel not available")
+        self._raw()
         return tuple(self._biases[CHANNELS.index(ch)] for ch in self._channels)
 
-    def load(self):
-        '''Load a stack of Bayer colour planes selected by the channels sequence'''
-        with rawpy.imread(self._path) as img:
-            raw_pixels_list = list()
-            for channel in CHANNELS:
-                x = self.CFA_OFFSETS[self._cfa][channel]['x']
-                y = self.CFA_OFFSETS[self._cfa][channel]['y']
-                # This is the real debayering thing
-                raw_pixels = img.raw_image[y::2, x::2].copy()
-                raw_pixels = self._trim(raw_pixels)
-                raw_pixels_list.append(raw_pixels)
-        # Select the desired channels
-        return self._select_by_channels(raw_pixels_list)
+    def release(self):
+        '''Drop the raw mosaic kept at init time, if any'''
+        self._raw_pixels = None
+
+    def _load(self, out=None):
+        with self._planes() as raw_pixels_list:
+            # Select the desired channels, copied while LibRaw memory is still valid
+            return self._select_by_channels(raw_pixels_list, out)
 
     def statistics(self):
         '''In-place statistics calculation for RPi Zero'''
         self._check_channels(
             err_msg="In-place statistics on G=(Gr+Gb)/2 channel not available")
-        with rawpy.imread(self._path) as img:
+        with self._planes() as raw_pixels_list:
             stats_list = list()
-            for channel in CHANNELS:
-                x = self.CFA_OFFSETS[self._cfa][channel]['x']
-                y = self.CFA_OFFSETS[self._cfa][channel]['y']
-                # This is the real debayering thing
-                raw_pixels = img.raw_image[y::2, x::2]
-                raw_pixels = self._trim(raw_pixels)
+            for raw_pixels in raw_pixels_list:
                 stats = (raw_pixels.mean(), raw_pixels.var(
                     dtype=np.float64, ddof=1))
                 stats_list.append(stats)
@@ -10,11 +10,11 @@
 # System wide imports
 # -------------------
 
-from .constants import FITS_EXTENSIONS, EXIF_EXTENSIONS
-from .simulation import SimulatedDarkImage
-from .exif import ExifImageLoader
-from .fits import FitsImageLoader
+# Loader backends (rawpy, exifread, astropy) are imported on first use
+from .registry import registry as default_registry
+from .batch import bounded_map, default_workers, executor_for
 import os
+import functools
 
 # ----------------
 # Module Constants
@@ -33,14 +33,57 @@ import os
 
 class ImageLoaderFactory:
 
-    def image_from(self, path, n_roi=None, channels=None, simulated=False, **kwargs):
-        extension = os.path.splitext(path)[1].lower()
+    def __init__(self, cache=None, plane_cache=None, registry=None):
+        '''Optional MetadataCache and PlaneCache shared by all loaders built by this factory
+        and a LoaderRegistry to choose loaders from (the default one if not given)'''
+        self._cache = cache
+        self._plane_cache = plane_cache
+        self._registry = default_registry if registry is None else registry
+
+    def image_from(self, path, n_roi=None, channels=None, simulated=False, keep_raw=None,
+                   section=None, header_only=None, **kwargs):
+        '''Loader options (keep_raw for EXIF, section for FITS, header_only for both) are only
+        passed when given. The remaining kwargs are simulation parameters, ignored otherwise'''
         if simulated:
-            image = SimulatedDarkImage(path, n_roi, channels, **kwargs)
-        elif extension in FITS_EXTENSIONS:
-            image = FitsImageLoader(path, n_roi, channels)
-        elif extension in EXIF_EXTENSIONS:
-            image = ExifImageLoader(path, n_roi, channels)
-        else:
+            from .simulation import SimulatedDarkImage
+            return SimulatedDarkImage(path, n_roi, channels, **kwargs)
+        loader_class = self._registry.resolve(path)
+        if loader_class is None:
+            extension = os.path.splitext(path)[1].lower()
             raise IOError(f'Extension {extension} not handled by ImageLoaderFactory')
-        return image
+        options = {'keep_raw': keep_raw, 'section': section, 'header_only': header_only}
+        options = {key: value for key, value in options.items() if value is not None}
+        return loader_class(path, n_roi, channels, cache=self._cache,
+                            plane_cache=self._plane_cache, **options)
+
+    async def aimage_from(self, path, n_roi=None, channels=None, simulated=False, **kwargs):
+        '''Awaitable image_from(), as building a loader already reads image headers'''
+        from . import aio  # asyncio only imported by async callers
+
+        return await aio.run(self.image_from, path, n_roi, channels, simulated, **kwargs)
+
+    def images_from(self, paths, n_roi=None, channels=None, max_workers=None, **kwargs):
+        '''Build loaders for a sequence of paths in a thread pool, in input order'''
+        build = functools.partial(self.image_from, n_roi=n_roi, channels=channels, **kwargs)
+        with executor_for(max_workers) as executor:
+            return list(executor.map(build, paths))
+
+    def load_many(self, paths, n_roi=None, channels=None, max_workers=None, processes=False,
+                  ordered=True, window=None, **kwargs):
+        '''Yields (path, pixels) tuples, decoded and trimmed in a thread or process pool.
+        At most window images (twice the workers by default) are in flight at any time.
+        '''
+        window = 2 * default_workers(max_workers) if window is None else window
+        load = functools.partial(_load, self, n_roi, channels, kwargs)
+        with executor_for(max_workers, processes) as executor:
+            yield from bounded_map(executor, load, paths, window, ordered)
+
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def _load(factory, n_roi, channels, kwargs, path):
+    '''Module level so that it can be pickled to worker processes'''
+    return path, factory.image_from(path, n_roi, channels, **kwargs).load()
@@ -13,6 +13,7 @@
 import os
 import math
 import logging
+import contextlib
 
 # ---------------------
 # Thrid-party libraries
@@ -25,9 +26,9 @@ from astropy.io import fits
 # Own package
 # -----------
 
-from .constants import CHANNELS
+from .constants import CHANNELS, CFA_OFFSETS
 from .roi import Roi
-from .abstract import AbstractImageLoader
+from .abstract import AbstractImageLoader, UnsupportedCFAError
 
 # ----------------
 # Module constants
@@ -42,8 +43,20 @@ log = logging.getLogger(__name__)
 
 class FitsImageLoader(AbstractImageLoader):
 
-    def __init__(self, path, v_roi, channels):
-        super().__init__(path, v_roi, channels)
+    # Header metadata that does not depend on ROI or channels and can be cached
+    HEADER_KEYS = ('exposure', 'camera', 'maker', 'iso', 'datetime', 'pedestal', 'log-gain',
+                   'xpixsize', 'ypixsize', 'bayerpat', 'imagetyp', 'f_number', 'focal_length')
+
+    def __init__(self, path, v_roi, channels, cache=None, section=False, plane_cache=None,
+                 header_only=False):
+        # header_only is accepted for symmetry with ExifImageLoader:
+        # FITS metadata is always read lazily from the primary header only
+        super().__init__(path, v_roi, channels, plane_cache=plane_cache)
+        self._dim = None
+        self._cfa = None
+        self._raw_shape = None
+        self._cache = cache
+        self._section = section  # ROI only reads from a memory mapped file
         # self._fits()
 
     def get_header(self, header, tag, default=None):
@@ -54,31 +67,15 @@ class FitsImageLoader(AbstractImageLoader):
         return value
 
     def _fits_metadata(self, hdul):
-        self._name = os.path.basename(self._path)
         header = hdul[0].header
         self._dim = header['NAXIS']
         if self._dim == 2:
-            height = header['NAXIS2']
-            width = header['NAXIS1']
             # Here we need to debayer, so a CFA keyword is needed
-            self._cfa = self.get_header(header, 'BAYER')
-            self._roi = Roi.from_normalized_roi(
-                width, height, self._n_roi, already_debayered=False)
-            self._shape = (height // 2, width // 2)
+            self._cfa = self.get_header(header, 'BAYER', self.get_header(header, 'BAYERPAT'))
         else:
             assert self._dim == 3
             Z = header['NAXIS3']  # noqa: F841
-            height = header['NAXIS2']
-            width = header['NAXIS1']
-            self._roi = Roi.from_normalized_roi(
-                width, height, self._n_roi, already_debayered=True)
-            self._shape = (height, width)
-            # Generic metadata
-        self._metadata['name'] = self._name
-        self._metadata['roi'] = str(self._roi)
-        self._metadata['channels'] = ' '.join(self._channels)
-        self._metadata['width'] = self._shape[1]
-        self._metadata['height'] = self._shape[0]
+        self._raw_shape = (header['NAXIS2'], header['NAXIS1'])
         self._metadata['exposure'] = header['EXPTIME']
         self._metadata['camera'] = self.get_header(header, 'INSTRUME')
         self._metadata['maker'] = self.get_header(header, 'MAKER')       # ?
@@ -95,6 +92,43 @@ class FitsImageLoader(AbstractImageLoader):
         self._metadata['f_number'] = (
             focal/diam) if diam is not None and focal is not None else None
         self._metadata['focal_length'] = focal
+        self._geometry()
+
+    def _geometry(self):
+        '''Metadata depending on the ROI and channels chosen for this loader'''
+        self._name = os.path.basename(self._path)
+        height, width = self._raw_shape
+        if self._dim == 2:
+            self._roi = Roi.from_normalized_roi(
+                width, height, self._n_roi, already_debayered=False)
+            self._shape = (height // 2, width // 2)
+        else:
+            self._roi = Roi.from_normalized_roi(
+                width, height, self._n_roi, already_debayered=True)
+            self._shape = (height, width)
+        # Generic metadata
+        self._metadata['name'] = self._name
+        self._metadata['roi'] = str(self._roi)
+        self._metadata['channels'] = ' '.join(self._channels)
+        self._metadata['width'] = self._shape[1]
+        self._metadata['height'] = self._shape[0]
+
+    def _get_state(self):
+        '''File intrinsic metadata, as a JSON serializable dictionary for the metadata cache'''
+        return {
+            'dim': self._dim,
+            'raw_shape': list(self._raw_shape),
+            'cfa': self._cfa,
+            'header': {key: self._metadata[key] for key in self.HEADER_KEYS},
+        }
+
+    def _set_state(self, state):
+        '''Restores the file intrinsic metadata from the metadata cache'''
+        self._dim = state['dim']
+        self._raw_shape = tuple(state['raw_shape'])
+        self._cfa = state['cfa']
+        self._metadata.update(state['header'])
+        self._geometry()
 
     def _fits(self):
         with fits.open(self._path) as hdul:
@@ -111,48 +145,132 @@ class FitsImageLoader(AbstractImageLoader):
                             x0:x1] if self._dim == 3 else pixels[y0:y1, x0:x1]
         return pixels
 
-    def _load_cube(self, hdul):
+    def _open(self):
+        if self._section:
+            # astropy refuses to memory map scaled (BZERO/BSCALE) data,
+            # so scaling is done by _read_section() on the ROI pixels only
+            return fits.open(self._path, memmap=True, do_not_scale_image_data=True)
+        return fits.open(self._path)
+
+    def _read_section(self, hdu, key):
+        '''Reads only the key section from disk, zero-copy when neither scaling nor byte swap are needed'''
+        bzero = hdu.header.get('BZERO', 0)
+        bscale = hdu.header.get('BSCALE', 1)
+        data = hdu.data  # memory mapped, nothing read yet
+        if bzero == 0 and bscale == 1 and data.dtype.isnative:
+            return data[key]
+        pixels = hdu.section[key]  # native byte order copy of the section only
+        if bscale == 1 and pixels.dtype.kind == 'i' and bzero == 2**(8 * pixels.dtype.itemsize - 1):
+            # FITS unsigned integer convention: flipping the sign bit adds BZERO in-place
+            pixels = pixels.view(pixels.dtype.str.replace('i', 'u'))
+            pixels ^= pixels.dtype.type(int(bzero))  # BZERO may be written as a float
+        elif bzero != 0 or bscale != 1:
+            pixels = bscale * pixels + bzero
+        return pixels
+
+    def _roi_key(self, roi=None):
+        roi = self._roi if roi is None else roi
+        return slice(roi.y0, roi.y1), slice(roi.x0, roi.x1)
+
+    def _cube(self, hdul, roi=None):
+        '''The whole cube trimmed by the ROI (this loader's one if not given)'''
+        if self._section:
+            return self._read_section(hdul[0], (slice(None),) + self._roi_key(roi))
         pixels = hdul[0].data
         assert len(pixels.shape) == 3
-        pixels = self._trim(pixels)
+        return self._trim(pixels) if roi is None else pixels[(slice(None),) + self._roi_key(roi)]
+
+    def _load_cube(self, hdul, out=None):
         if self._channels is None or len(self._channels) == 4:
-            return pixels.copy()
-        return self._select_by_channels(pixels)
+            pixels = self._cube(hdul)
+            if out is not None:
+                out[...] = pixels
+                return out
+            return pixels if self._section else pixels.copy()
+        if self._section:
+            # Read only the planes needed by the selected channels
+            needed = self._needed_planes()
+            pixels = [self._read_section(hdul[0], (i,) + self._roi_key()) if i in needed else None
+                      for i in range(len(CHANNELS))]
+        else:
+            pixels = self._cube(hdul)
+        return self._select_by_channels(pixels, out)
+
+    def _bayer_plane(self, hdu, channel, roi=None):
+        '''Bayer plane of a 2D image as a strided view, already trimmed by the ROI'''
+        roi = self._roi if roi is None else roi
+        offsets = CFA_OFFSETS[self.cfa_pattern()][channel]
+        x = offsets['x']
+        y = offsets['y']
+        # ROI is given in plane coordinates, so trimming goes into the strides
+        rows = slice(2 * roi.y0 + y, 2 * roi.y1 + y, 2)
+        if self._section:
+            # astropy reads column strided sections element by element,
+            # so read the contiguous column span and stride it in memory
+            columns = slice(2 * roi.x0 + x, 2 * roi.x1 + x - 1)
+            return self._read_section(hdu, (rows, columns))[:, ::2]
+        return hdu.data[rows, 2 * roi.x0 + x:2 * roi.x1 + x:2]
 
-    def _load_debayer(self, hdul):
-        raise NotImplementedError("Debayering for FITS still not supported")
+    def _bayer_planes(self, hdul, needed=None, roi=None):
+        '''Bayer planes of a 2D image, only those needed are ever read'''
+        needed = range(len(CHANNELS)) if needed is None else needed
+        return [self._bayer_plane(hdul[0], ch, roi) if i in needed else None
+                for i, ch in enumerate(CHANNELS)]
+
+    def _load_debayer(self, hdul, out=None):
+        return self._select_by_channels(self._bayer_planes(hdul, self._needed_planes()), out)
+
+    @contextlib.contextmanager
+    def _planes(self, roi=None):
+        with self._open() as hdul:
+            self._fits_metadata(hdul)
+            if self._dim == 2:
+                yield self._bayer_planes(hdul, self._needed_planes(), roi)
+            else:
+                yield self._cube(hdul, roi)
 
     def metadata(self):
         if self._name is None:
-            self._fits()
+            state = None if self._cache is None else self._cache.get(self._path)
+            if state is None:
+                self._fits()
+                if self._cache is not None:
+                    self._cache.put(self._path, self._get_state())
+            else:
+                self._set_state(state)
         return self._metadata
 
+    def cfa_pattern(self):
+        '''Returns the Bayer pattern as RGGB, BGGR, GRBG, GBRG strings'''
+        if self._dim is None:
+            self.metadata()
+        if self._cfa not in CFA_OFFSETS:
+            raise UnsupportedCFAError(self._cfa)
+        return self._cfa
+
     def shape(self):
         '''Overrdies base method'''
-        if self._dim == 2:
-            return super().shape()
-        else:
-            return self._shape
+        if self._dim is None:
+            self.metadata()
+        return self._shape
 
-    def load(self):
-        ''' For the time being we only support FITS 3D cubes'''
-        with fits.open(self._path) as hdul:
+    def _load(self, out=None):
+        with self._open() as hdul:
             self._fits_metadata(hdul)
             if self._dim == 2:
-                nparray = self._load_debayer(hdul)
+                nparray = self._load_debayer(hdul, out)
             else:
-                nparray = self._load_cube(hdul)
+                nparray = self._load_cube(hdul, out)
         return nparray
 
     def statistics(self):
         '''In-place statistics calculation for RPi Zero'''
-        with fits.open(self._path) as hdul:
-            self._fits_metadata(hdul)
-            pixels = hdul[0].data
-            assert len(pixels.shape) == 3
-            pixels = self._trim(pixels)
-            average = pixels.mean(axis=0)
-            variance = pixels.var(axis=0, dtype=np.float64, ddof=1)
+        with self._planes() as pixels:
+            # Planes not needed by the selected channels may not have been read
+            average = np.array([np.nan if plane is None else plane.mean()
+                                for plane in pixels])
+            variance = np.array([np.nan if plane is None else plane.var(dtype=np.float64, ddof=1)
+                                 for plane in pixels])
             output_list = list()
             if self._channels is None or len(self._channels) == 4:
                 output_list = list(zip(average.tolist(), variance.tolist()))
@@ -166,7 +284,7 @@ class FitsImageLoader(AbstractImageLoader):
                     else:
                         i = CHANNELS.index(ch)
                         output_list.append([average[i], math.sqrt(variance[i])])
-                return np.stack(output_list)
+            return np.stack(output_list)
 
 
 # ------------------
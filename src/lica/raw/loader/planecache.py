@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import logging
+import threading
+import collections
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# -----------
+# Own package
+# -----------
+
+# ----------------
+# Module constants
+# ----------------
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+
+class PlaneCache:
+    """In-memory LRU cache of decoded Bayer plane stacks, bounded by max_bytes.
+
+    It is meant to be shared by many loaders. Cached arrays are read-only,
+    so that they can be safely handed to several callers.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        # Only the budget travels to worker processes, each one starting empty
+        return {"max_bytes": self._max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_bytes"])
+
+    @staticmethod
+    def key(path, roi, channels):
+        return os.path.abspath(path), os.stat(path).st_mtime_ns, str(roi), tuple(channels)
+
+    def get(self, key):
+        with self._lock:
+            pixels = self._entries.get(key)
+            if pixels is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return pixels
+
+    def put(self, key, pixels):
+        """Stores pixels, evicting the least recently used entries if needed.
+        Returns pixels, now read-only"""
+        pixels.flags.writeable = False
+        if pixels.nbytes > self._max_bytes:
+            log.debug("%d bytes entry exceeds the %d bytes budget, not cached", pixels.nbytes, self._max_bytes)
+            return pixels
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            while self._entries and self.nbytes + pixels.nbytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+            self._entries[key] = pixels
+            self.nbytes += pixels.nbytes
+        return pixels
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (
+            f"PlaneCache(entries={len(self)}, nbytes={self.nbytes}, hits={self.hits}, "
+            f"misses={self.misses}, evictions={self.evictions})"
+        )
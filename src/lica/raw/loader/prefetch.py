@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# -----------
+# Own package
+# -----------
+
+from .batch import bounded_map
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def _load(loader):
+    return loader, loader.load()
+
+
+# -------
+# Classes
+# -------
+
+
+class Prefetcher:
+    """Iterates over image loaders yielding (loader, pixels) tuples in order,
+    while the next depth images are being read in background threads.
+
+    blocked is the accumulated time (in seconds) the consumer has been
+    waiting for images not yet loaded, i.e. I/O not hidden behind compute.
+    """
+
+    def __init__(self, loaders, depth=2):
+        if depth < 1:
+            raise ValueError(f"prefetch depth must be at least 1, not {depth}")
+        self._loaders = loaders
+        self._depth = depth
+        self.blocked = 0.0
+        self.count = 0
+
+    def __iter__(self):
+        with ThreadPoolExecutor(self._depth) as executor:
+            results = bounded_map(executor, _load, self._loaders, self._depth)
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    item = next(results)
+                except StopIteration:
+                    return
+                finally:
+                    self.blocked += time.perf_counter() - t0
+                self.count += 1
+                yield item
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import logging
+import importlib
+import itertools
+import threading
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+# -----------
+# Own package
+# -----------
+
+from .constants import FITS_EXTENSIONS, EXIF_EXTENSIONS
+
+# ----------------
+# Module constants
+# ----------------
+
+# Plug-ins advertise a register(registry) function in this entry point group
+ENTRY_POINT_GROUP = "lica.raw.loaders"
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def _resolve(target):
+    """Imports 'package.module:name' strings, other objects are returned as is"""
+    if not isinstance(target, str):
+        return target
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+# -------
+# Classes
+# -------
+
+
+class _Entry:
+    def __init__(self, loader, extensions, sniffer, priority, order):
+        self.loader = loader
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.sniffer = sniffer
+        self.priority = priority
+        self.order = order
+
+    def matches(self, path, extension):
+        if self.extensions and extension not in self.extensions:
+            return False
+        if self.sniffer is not None:
+            self.sniffer = _resolve(self.sniffer)
+            return self.sniffer(path)
+        return bool(self.extensions)
+
+    def loader_class(self):
+        self.loader = _resolve(self.loader)
+        return self.loader
+
+
+class LoaderRegistry:
+    """Maps file extensions and/or content sniffers to image loader classes.
+
+    Loader classes and sniffers may be given as 'package.module:name' strings
+    so that they are imported only when first needed. Loader classes must accept
+    (path, n_roi, channels, cache=None, plane_cache=None, **kwargs).
+    The highest priority match wins, the latest registered one among equals.
+    """
+
+    def __init__(self):
+        self._entries = list()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._plugins_loaded = False
+
+    def __getstate__(self):
+        # Locks and counters do not travel to worker processes
+        return {"entries": self._entries, "plugins_loaded": self._plugins_loaded}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self._entries = state["entries"]
+        self._order = itertools.count(len(self._entries))
+        self._plugins_loaded = state["plugins_loaded"]
+
+    def register(self, loader, extensions=(), sniffer=None, priority=0):
+        """sniffer is an optional callable(path) -> bool refining (or replacing) extension matching"""
+        if not extensions and sniffer is None:
+            raise ValueError("Either extensions or a sniffer must be given")
+        with self._lock:
+            self._entries.append(_Entry(loader, extensions, sniffer, priority, next(self._order)))
+
+    def _load_plugins(self):
+        with self._lock:
+            if self._plugins_loaded:
+                return
+            self._plugins_loaded = True
+        # Imported here, as it is slow and only needed once
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                entry_point.load()(self)
+            except Exception as e:
+                log.warning("Skipping image loader plug-in %s: %s", entry_point.name, e)
+
+    def resolve(self, path):
+        """Returns the loader class for path or None if no loader handles it"""
+        self._load_plugins()
+        extension = os.path.splitext(path)[1].lower()
+        candidates = sorted(self._entries, key=lambda e: (e.priority, e.order), reverse=True)
+        for entry in candidates:
+            if entry.matches(path, extension):
+                return entry.loader_class()
+        return None
+
+
+# Default registry used by ImageLoaderFactory
+registry = LoaderRegistry()
+registry.register("lica.raw.loader.fits:FitsImageLoader", extensions=FITS_EXTENSIONS)
+registry.register("lica.raw.loader.exif:ExifImageLoader", extensions=EXIF_EXTENSIONS)
+
+
+def register(loader, extensions=(), sniffer=None, priority=0):
+    """Registers a loader in the default registry"""
+    registry.register(loader, extensions, sniffer, priority)
@@ -27,12 +27,14 @@ import numpy as np
 class Point:
     """Point class represents and manipulates x,y coords."""
 
+    __slots__ = ("x", "y")
+
     PATTERN = r"\((\d+),(\d+)\)"
+    REGEXP = re.compile(PATTERN)
 
     @classmethod
     def from_string(cls, point_str):
-        pattern = re.compile(Point.PATTERN)
-        matchobj = pattern.search(point_str)
+        matchobj = cls.REGEXP.search(point_str)
         if matchobj:
             x = int(matchobj.group(1))
             y = int(matchobj.group(2))
@@ -55,6 +57,8 @@ class Point:
 class NormRoi:
     """Normalized Roiangle with 0..1 floating point coordinates and dimensions"""
 
+    __slots__ = ("x0", "y0", "width", "height")
+
     def __init__(self, n_x0=None, n_y0=None, n_width=1.0, n_height=1.0):
         self.x0 = n_x0
         self.y0 = n_y0
@@ -78,14 +82,16 @@ class NormRoi:
 class Roi:
     """Region of interest"""
 
+    __slots__ = ("x0", "y0", "x1", "y1")
+
     # NumPy style [row0:row1,col0:col1]
     PATTERN = r"\[(\d+):(\d+),(\d+):(\d+)\]"
+    REGEXP = re.compile(PATTERN)
 
     @classmethod
     def from_string(cls, Roi_str):
         """numpy sections style"""
-        pattern = re.compile(Roi.PATTERN)
-        matchobj = pattern.search(Roi_str)
+        matchobj = cls.REGEXP.search(Roi_str)
         if matchobj:
             y0 = int(matchobj.group(1))
             y1 = int(matchobj.group(2))
@@ -174,3 +180,104 @@ class Roi:
     def __repr__(self):
         """string in NumPy section notation"""
         return f"[{self.y0}:{self.y1},{self.x0}:{self.x1}]"
+
+
+class RoiSet:
+    """Vectorized set of regions of interest, with x0, x1, y0, y1 held in NumPy arrays"""
+
+    __slots__ = ("x0", "y0", "x1", "y1")
+
+    @classmethod
+    def from_rois(cls, rois):
+        rois = list(rois)
+        return cls(
+            [roi.x0 for roi in rois],
+            [roi.x1 for roi in rois],
+            [roi.y0 for roi in rois],
+            [roi.y1 for roi in rois],
+        )
+
+    @classmethod
+    def from_normalized_roi(cls, width, height, n_x0, n_y0, n_width, n_height, already_debayered=True):
+        """Bulk version of Roi.from_normalized_roi(), taking arrays of normalized coordinates.
+        n_x0 or n_y0 given as None (or NaN items) center the ROIs along that axis"""
+        n_width = np.asarray(n_width, dtype=np.float64)
+        n_height = np.asarray(n_height, dtype=np.float64)
+        n_x0 = np.full_like(n_width, np.nan) if n_x0 is None else np.asarray(n_x0, dtype=np.float64)
+        n_y0 = np.full_like(n_height, np.nan) if n_y0 is None else np.asarray(n_y0, dtype=np.float64)
+        if np.any(n_x0 + n_width > 1.0):
+            raise ValueError("some normalized x0 + width exceed 1.0")
+        if np.any(n_y0 + n_height > 1.0):
+            raise ValueError("some normalized y0 + height exceed 1.0")
+        # If not already_debayered, we'll adjust to each image plane dimensions
+        if not already_debayered:
+            height = height // 2
+            width = width // 2
+        w = np.round(width * n_width).astype(np.int64)
+        h = np.round(height * n_height).astype(np.int64)
+        x0 = np.where(np.isnan(n_x0), (width - w) // 2, np.round(width * np.nan_to_num(n_x0)))
+        y0 = np.where(np.isnan(n_y0), (height - h) // 2, np.round(height * np.nan_to_num(n_y0)))
+        x0 = x0.astype(np.int64)
+        y0 = y0.astype(np.int64)
+        return cls(x0, x0 + w, y0, y0 + h)
+
+    @classmethod
+    def grid(cls, width, height, nx, ny):
+        """Regular grid of ny x nx tiles covering a width x height image, row major order"""
+        tw = width // nx
+        th = height // ny
+        y0, x0 = np.meshgrid(np.arange(ny) * th, np.arange(nx) * tw, indexing="ij")
+        x0 = x0.ravel()
+        y0 = y0.ravel()
+        return cls(x0, x0 + tw, y0, y0 + th)
+
+    def __init__(self, x0, x1, y0, y1):
+        x0, x1, y0, y1 = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(c, dtype=np.int64)) for c in (x0, x1, y0, y1))
+        )
+        self.x0 = np.minimum(x0, x1)
+        self.y0 = np.minimum(y0, y1)
+        self.x1 = np.maximum(x0, x1)
+        self.y1 = np.maximum(y0, y1)
+
+    def __len__(self):
+        return self.x0.shape[0]
+
+    def __getitem__(self, key):
+        """Integer keys give a Roi, slices, masks and index arrays give a RoiSet"""
+        if isinstance(key, (int, np.integer)):
+            return Roi(int(self.x0[key]), int(self.x1[key]), int(self.y0[key]), int(self.y1[key]))
+        return RoiSet(self.x0[key], self.x1[key], self.y0[key], self.y1[key])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def width(self):
+        return self.x1 - self.x0
+
+    def height(self):
+        return self.y1 - self.y0
+
+    def centre(self):
+        return (self.x0 + self.width() / 2, self.y0 + self.height() / 2)
+
+    def translate(self, dx, dy):
+        return RoiSet(self.x0 + dx, self.x1 + dx, self.y0 + dy, self.y1 + dy)
+
+    def clip(self, width, height):
+        """ROIs clipped to a width x height image. Fully outside ROIs become empty"""
+        x0 = np.clip(self.x0, 0, width)
+        x1 = np.clip(self.x1, 0, width)
+        y0 = np.clip(self.y0, 0, height)
+        y1 = np.clip(self.y1, 0, height)
+        return RoiSet(x0, x1, y0, y1)
+
+    def __add__(self, point):
+        return self.translate(point.x, point.y)
+
+    def __radd__(self, point):
+        return self.__add__(point)
+
+    def __repr__(self):
+        return f"RoiSet({len(self)} ROIs)"
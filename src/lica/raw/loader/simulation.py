@@ -22,9 +22,16 @@ import numpy as np
 
 from .constants import CHANNELS
 from .exif import ExifImageLoader
+from .synthetic import seed_entropy, frame_rng
 
 
 class SimulatedDarkImage(ExifImageLoader):
+    """Dark frame with the geometry and metadata of a real image.
+
+    The noise of each frame comes from its own random stream, derived from the
+    base seed and the frame index, so results do not depend on worker count or order.
+    """
+
     def __init__(self, path, n_roi=None, channels=None, **kwargs):
         # The rest of metadata is taken from the EXIF & RAW header
         super().__init__(path, n_roi, channels)
@@ -32,22 +39,25 @@ class SimulatedDarkImage(ExifImageLoader):
         self._dk_current = 0.0 if self._dk_current is None else self._dk_current
         self._rd_noise = kwargs.get("read_noise")
         self._rd_noise = 1.0 if self._rd_noise is None else self._rd_noise
+        self._seed = seed_entropy(kwargs.get("seed"))
+        self._frame = kwargs.get("frame") or 0
+
+    def seed(self):
+        """Base seed entropy, enough to reproduce every frame"""
+        return self._seed
 
-    def load(self):
+    def _load(self, out=None):
         """Get a stack of Bayer colour planes selected by the channels sequence"""
         self._check_channels(
             err_msg="In-place statistics on G=(Gr+Gb)/2 channel not available"
         )
-        raw_pixels_list = list()
-        rng = np.random.default_rng()
-        dark = [self._dk_current * self.exptime() for ch in CHANNELS]
-        for i, ch in enumerate(CHANNELS):
-            raw_pixels = (
-                self._biases[i]
-                + dark[i]
-                + self._rd_noise * rng.standard_normal(size=self._shape)
-            )
-            raw_pixels = np.asarray(raw_pixels, dtype=np.uint16)
-            raw_pixels = self._trim(raw_pixels)
-            raw_pixels_list.append(raw_pixels)
-        return self._select_by_channels(raw_pixels_list)
+        self._raw()
+        rng = frame_rng(self._seed, self._frame)
+        # All four planes at once
+        raw_pixels = rng.standard_normal(size=(len(CHANNELS),) + self._shape)
+        raw_pixels *= self._rd_noise
+        raw_pixels += self._dk_current * self.exptime()
+        raw_pixels += np.asarray(self._biases, dtype=np.float64).reshape(-1, 1, 1)
+        raw_pixels = np.asarray(raw_pixels, dtype=np.uint16)
+        raw_pixels_list = [self._trim(plane) for plane in raw_pixels]
+        return self._select_by_channels(raw_pixels_list, out)
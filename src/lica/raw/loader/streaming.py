@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+
+# ----------------
+# Module constants
+# ----------------
+
+# Default memory budget for the per block temporaries
+TILE_BYTES = 4 * 1024 * 1024
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def row_blocks(height, row_bytes, max_bytes=TILE_BYTES):
+    """Yields row slices so that each block temporary stays within max_bytes"""
+    rows = max(1, max_bytes // max(1, row_bytes))
+    for y0 in range(0, height, rows):
+        yield slice(y0, min(y0 + rows, height))
+
+
+# -------
+# Classes
+# -------
+
+
+class RunningStatistics:
+    """Single pass per channel statistics, merging blocks with Chan et al. formulae.
+
+    Saturation levels may be given per channel. When missing, the maximum value
+    of an integer block dtype is used instead and floating point blocks are not counted.
+    count_saturated=False skips the saturation count altogether.
+    """
+
+    def __init__(self, n_channels, saturation=None, count_saturated=True):
+        self.count = np.zeros(n_channels, dtype=np.int64)
+        self.mean = np.zeros(n_channels, dtype=np.float64)
+        self.m2 = np.zeros(n_channels, dtype=np.float64)
+        self.min = np.full(n_channels, np.inf)
+        self.max = np.full(n_channels, -np.inf)
+        self.saturated = np.zeros(n_channels, dtype=np.int64)
+        self._saturation = saturation
+        self._count_saturated = count_saturated
+
+    def _level(self, k, block):
+        if not self._count_saturated:
+            return None
+        if self._saturation is not None:
+            return self._saturation[k]
+        if np.issubdtype(block.dtype, np.integer):
+            return np.iinfo(block.dtype).max
+        return None
+
+    def update(self, k, block):
+        """Merges a block of pixels into channel k statistics"""
+        n_b = block.size
+        if n_b == 0:
+            return
+        # The only temporary, a contiguous float64 copy of the block
+        values = block.astype(np.float64).ravel()
+        mean_b = values.mean()
+        values -= mean_b
+        m2_b = np.dot(values, values)
+        n_a = self.count[k]
+        n = n_a + n_b
+        delta = mean_b - self.mean[k]
+        self.mean[k] += delta * n_b / n
+        self.m2[k] += m2_b + delta * delta * n_a * n_b / n
+        self.count[k] = n
+        self.min[k] = min(self.min[k], block.min())
+        self.max[k] = max(self.max[k], block.max())
+        level = self._level(k, block)
+        if level is not None:
+            self.saturated[k] += np.count_nonzero(block >= level)
+
+    def merge(self, other):
+        """Merges all channels of another RunningStatistics into this one"""
+        n = self.count + other.count
+        safe = np.where(n > 0, n, 1)
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / safe
+        self.m2 += other.m2 + delta * delta * self.count * other.count / safe
+        self.count = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.saturated += other.saturated
+
+    def variance(self, ddof=1):
+        return self.m2 / np.maximum(self.count - ddof, 1)
+
+    def result(self):
+        return {
+            "mean": self.mean.copy(),
+            "variance": self.variance(),
+            "min": self.min.copy(),
+            "max": self.max.copy(),
+            "saturated": self.saturated.copy(),
+        }
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import functools
+import contextlib
+
+# ---------------------
+# Thrid-party libraries
+# ---------------------
+
+import numpy as np
+
+# -----------
+# Own package
+# -----------
+
+from .constants import CHANNELS, CFA_OFFSETS
+from .roi import Roi
+from .abstract import AbstractImageLoader, UnsupportedCFAError
+from .batch import bounded_map, default_workers, executor_for
+
+# ----------------
+# Module constants
+# ----------------
+
+DEFAULT_SHAPE = (1520, 2028)  # Bayer plane size of a RPi HQ camera
+
+# Spawn keys separating per frame random streams from the fixed pattern one
+FRAME_STREAM = 0
+PATTERN_STREAM = 1
+
+# ------------------
+# Auxiliar functions
+# ------------------
+
+
+def seed_entropy(seed=None):
+    """Base seed entropy, a fresh one if seed is None, to be logged for reproducibility"""
+    return np.random.SeedSequence(seed).entropy
+
+
+def frame_rng(seed, frame):
+    """Independent random generator for a given frame index, a grandchild stream of the
+    base seed under the FRAME_STREAM key, built directly without spawning previous frames.
+    Frames can thus be generated in any order and process with identical results"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(FRAME_STREAM, frame)))
+
+
+def pattern_rng(seed):
+    """Random generator for fixed patterns (i.e. PRNU), independent from frame streams"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(PATTERN_STREAM,)))
+
+
+def _generate(loader, frames):
+    """Module level so that it can be pickled to worker processes"""
+    return frames.start, loader.generate(len(frames), frames.start)
+
+
+def _per_channel(value):
+    """Scalar or per channel (R, Gr, Gb, B) sequence as a (4, 1, 1) array"""
+    return np.broadcast_to(np.asarray(value, dtype=np.float32), (len(CHANNELS),)).reshape(-1, 1, 1)
+
+
+# -------
+# Classes
+# -------
+
+
+class SyntheticImageLoader(AbstractImageLoader):
+    """File-free image source with a simple sensor model, vectorized over whole frames.
+
+    shape is the Bayer plane size (height, width). Dark current (e-/s), read noise (e-)
+    and signal (e-/s) are converted to ADU by the gain (e-/ADU) and added to the bias (ADU).
+    Bias and signal may be scalars or per channel (R, Gr, Gb, B) sequences. prnu is the
+    relative sigma of a fixed photo response pattern, and shot_noise adds Poisson noise.
+
+    Each frame has its own random stream derived from the base seed and the frame index,
+    so any frame is reproducible on its own. load() returns the given frame index.
+    """
+
+    def __init__(self, shape=DEFAULT_SHAPE, n_roi=None, channels=None, cfa="RGGB", bias=256,
+                 white_level=4095, dark_current=0.0, read_noise=1.0, gain=1.0, exptime=1.0,
+                 signal=0.0, prnu=0.0, shot_noise=False, seed=None, frame=0, name="synthetic"):
+        super().__init__(name, n_roi, channels)
+        if cfa not in CFA_OFFSETS:
+            raise UnsupportedCFAError(cfa)
+        self._cfa = cfa
+        self._bias = _per_channel(bias)
+        self._white_level = white_level
+        self._dk_current = dark_current
+        self._rd_noise = read_noise
+        self._gain = gain
+        self._exptime = exptime
+        self._signal = _per_channel(signal)
+        self._prnu = prnu
+        self._shot_noise = shot_noise
+        self._seed = seed_entropy(seed)
+        self._frame = frame
+        self._prnu_map = None
+        self._shape = tuple(shape)
+        self._name = name
+        height, width = self._shape
+        self._roi = Roi.from_normalized_roi(width, height, self._n_roi, already_debayered=True)
+        self._metadata["name"] = self._name
+        self._metadata["roi"] = str(self._roi)
+        self._metadata["channels"] = " ".join(self._channels)
+        self._metadata["width"] = width
+        self._metadata["height"] = height
+        self._metadata["exposure"] = exptime
+        self._metadata["camera"] = "synthetic"
+        self._metadata["maker"] = None
+        self._metadata["iso"] = None
+        self._metadata["datetime"] = None
+        self._metadata["bayerpat"] = cfa
+        self._metadata["log-gain"] = None
+        self._metadata["imagetyp"] = "dark" if not np.any(self._signal) else "flat"
+
+    def _mean_electrons(self):
+        electrons = self._signal * self._exptime
+        if self._prnu:
+            if self._prnu_map is None:
+                # Fixed pattern, the same for every frame
+                size = (len(CHANNELS),) + self._shape
+                rng = pattern_rng(self._seed)
+                self._prnu_map = rng.standard_normal(size, dtype=np.float32) * self._prnu
+            electrons = electrons * (1 + self._prnu_map)
+        return electrons + self._dk_current * self._exptime
+
+    def _generate_frame(self, index, mean_electrons, out):
+        """Generates frame index into the (4, h, w) uint16 out buffer"""
+        rng = frame_rng(self._seed, index)
+        if self._shot_noise:
+            electrons = rng.poisson(mean_electrons).astype(np.float32)
+        else:
+            electrons = mean_electrons
+        noise = rng.standard_normal(out.shape, dtype=np.float32)
+        noise *= self._rd_noise
+        noise += electrons
+        noise /= self._gain
+        noise += self._bias
+        np.clip(np.round(noise, out=noise), 0, self._white_level, out=noise)
+        out[...] = noise
+
+    def generate(self, n_frames=1, start=0):
+        """Returns a (n_frames, 4, h, w) uint16 stack of full Bayer planes, ordered as CHANNELS,
+        for frame indices start .. start + n_frames - 1"""
+        size = (len(CHANNELS),) + self._shape
+        mean_electrons = np.broadcast_to(self._mean_electrons(), size).astype(np.float32)
+        stack = np.empty((n_frames,) + size, dtype=np.uint16)
+        for i in range(n_frames):
+            self._generate_frame(start + i, mean_electrons, stack[i])
+        return stack
+
+    def generate_parallel(self, n_frames, start=0, max_workers=None, processes=True, chunk=8):
+        """Same stack as generate(), bit by bit, but computed by chunks in a worker pool"""
+        size = (len(CHANNELS),) + self._shape
+        stack = np.empty((n_frames,) + size, dtype=np.uint16)
+        chunks = [range(i, min(i + chunk, n_frames)) for i in range(0, n_frames, chunk)]
+        chunks = [range(start + c.start, start + c.stop) for c in chunks]
+        window = 2 * default_workers(max_workers)
+        with executor_for(max_workers, processes) as executor:
+            for first, frames in bounded_map(executor, functools.partial(_generate, self), chunks,
+                                             window, ordered=False):
+                stack[first - start : first - start + len(frames)] = frames
+        return stack
+
+    def seed(self):
+        """Base seed entropy, enough to reproduce every frame"""
+        return self._seed
+
+    @contextlib.contextmanager
+    def _planes(self, roi=None):
+        roi = self._roi if roi is None else roi
+        planes = self.generate(1, self._frame)[0]
+        yield [plane[roi.y0 : roi.y1, roi.x0 : roi.x1] for plane in planes]
+
+    def _load(self, out=None):
+        with self._planes() as planes:
+            return self._select_by_channels(planes, out)
+
+    # ----------
+    # Public API
+    # ----------
+
+    def metadata(self):
+        return self._metadata
+
+    def cfa_pattern(self):
+        return self._cfa
+
+    def saturation_levels(self):
+        self._check_channels(err_msg="saturation_levels on G=(Gr+Gb)/2 channel not available")
+        return tuple(self._white_level for ch in self._channels)
+
+    def black_levels(self):
+        self._check_channels(err_msg="black_levels on G=(Gr+Gb)/2 channel not available")
+        bias = self._bias.reshape(-1)
+        return tuple(float(bias[CHANNELS.index(ch)]) for ch in self._channels)
+
+    def statistics(self):
+        """Mean and variance per channel"""
+        self._check_channels(err_msg="In-place statistics on G=(Gr+Gb)/2 channel not available")
+        with self._planes() as planes:
+            stats_list = [(plane.mean(), plane.var(dtype=np.float64, ddof=1)) for plane in planes]
+        return self._select_by_channels(stats_list)
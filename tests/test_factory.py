@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+import pytest
+
+np = pytest.importorskip("numpy")
+fits = pytest.importorskip("astropy.io.fits")
+
+from lica.raw.loader import ImageLoaderFactory, CHANNELS  # noqa: E402
+
+
+@pytest.fixture
+def cube(tmp_path):
+    hdu = fits.PrimaryHDU(np.zeros((4, 10, 12), dtype=np.uint16))
+    hdu.header["EXPTIME"] = 1.0
+    path = tmp_path / "cube.fits"
+    hdu.writeto(path)
+    return str(path)
+
+
+def test_simulation_kwargs_ignored_when_not_simulated(cube):
+    loader = ImageLoaderFactory().image_from(
+        cube, None, CHANNELS, simulated=False, dark_current=1.0, read_noise=2.0
+    )
+    assert loader.load().shape == (4, 10, 12)
+
+
+def test_loader_options_forwarded(cube):
+    loader = ImageLoaderFactory().image_from(cube, None, CHANNELS, section=True)
+    assert loader.load().shape == (4, 10, 12)
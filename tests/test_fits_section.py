@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+import pytest
+
+np = pytest.importorskip("numpy")
+fits = pytest.importorskip("astropy.io.fits")
+
+from lica.raw.loader import CHANNELS, NormRoi  # noqa: E402
+from lica.raw.loader.fits import FitsImageLoader  # noqa: E402
+
+
+@pytest.fixture
+def float_bzero_cube(tmp_path):
+    """uint16 cube stored with the unsigned convention, BZERO written as a float"""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 65536, size=(4, 30, 40), dtype=np.uint16)
+    hdu = fits.PrimaryHDU((pixels.astype(np.int32) - 32768).astype(np.int16))
+    hdu.header["BZERO"] = 32768.0
+    hdu.header["BSCALE"] = 1
+    hdu.header["EXPTIME"] = 1.0
+    path = tmp_path / "float-bzero.fits"
+    hdu.writeto(path)
+    return str(path), pixels
+
+
+def test_section_float_bzero(float_bzero_cube):
+    path, pixels = float_bzero_cube
+    roi = NormRoi(0.25, 0.25, 0.5, 0.5)
+    section = FitsImageLoader(path, roi, CHANNELS, section=True).load()
+    plain = FitsImageLoader(path, roi, CHANNELS).load()
+    assert section.dtype == np.uint16
+    np.testing.assert_array_equal(section, plain)
+    np.testing.assert_array_equal(section, pixels[:, 8:23, 10:30])
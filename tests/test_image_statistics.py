@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lica.raw.loader import SyntheticImageLoader  # noqa: E402
+from lica.raw.analyzer.image import ImagePairStatistics  # noqa: E402
+
+
+def pair(channels, dtype):
+    stats = ImagePairStatistics.attach(
+        SyntheticImageLoader((20, 30), channels=channels, seed=1, frame=0, read_noise=5),
+        bias=256.0, dtype=dtype,
+    )
+    stats._image_b = SyntheticImageLoader((20, 30), channels=channels, seed=1, frame=1,
+                                          read_noise=5)
+    stats.run()
+    return stats
+
+
+@pytest.mark.parametrize("channels", [("R", "Gr", "Gb", "B"), ("R", "G", "B")])
+def test_integer_dtype_pair_statistics(channels):
+    integer = pair(channels, np.uint16)
+    floating = pair(channels, np.float64)
+    np.testing.assert_allclose(integer.pair_mean(), floating.pair_mean())
+    np.testing.assert_allclose(integer.adj_pair_variance(), floating.adj_pair_variance())
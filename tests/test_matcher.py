@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+fits = pytest.importorskip("astropy.io.fits")
+
+from lica.raw.loader import ImageLoaderFactory  # noqa: E402
+from lica.raw.analyzer.matcher import frame_info  # noqa: E402
+
+
+class LockedCache:
+    def get(self, path):
+        raise sqlite3.OperationalError("database is locked")
+
+    def put(self, path, state):
+        raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.fixture
+def cube(tmp_path):
+    hdu = fits.PrimaryHDU(np.zeros((4, 10, 12), dtype=np.uint16))
+    hdu.header["EXPTIME"] = 2.0
+    path = tmp_path / "cube.fits"
+    hdu.writeto(path)
+    return str(path)
+
+
+def test_frame_info(cube):
+    info = frame_info(ImageLoaderFactory(), cube)
+    assert info.path == cube
+    assert info.exptime == 2.0
+
+
+def test_unreadable_frame_is_skipped(tmp_path):
+    path = tmp_path / "notes.fits"
+    path.write_text("not an image")
+    assert frame_info(ImageLoaderFactory(), str(path)) is None
+
+
+def test_cache_errors_propagate(tmp_path):
+    path = tmp_path / "frame.dng"
+    path.write_bytes(b"")
+    with pytest.raises(sqlite3.OperationalError):
+        frame_info(ImageLoaderFactory(cache=LockedCache()), str(path))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# Copyright (c) 2021
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lica.raw.loader.roi import RoiSet  # noqa: E402
+
+
+def test_scalar_roi_set_is_a_single_roi():
+    rois = RoiSet.from_normalized_roi(400, 300, 0.1, 0.1, 0.5, 0.5)
+    assert len(rois) == 1
+    (roi,) = list(rois)
+    assert (roi.x0, roi.x1, roi.y0, roi.y1) == (40, 240, 30, 180)
+
+
+def test_scalar_coordinates_broadcast():
+    rois = RoiSet(0, [10, 20], 0, 5)
+    assert len(rois) == 2
+    assert rois.width().tolist() == [10, 20]